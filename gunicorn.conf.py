@@ -2,10 +2,50 @@
 # image. As a result, a user can override any of these properties by providing
 # additional arguments to the container.
 
+import os
+from pathlib import Path
+import shutil
+import tempfile
+
 bind = ["[::]:9770"]
 
+# The app moves gunicorn's log handlers behind a queue (see log_config), so
+# writing an access log line never blocks a request. FLASK_LOG_ACCESS_RATE_LIMIT
+# limits the number of lines written per second.
 accesslog = "-"
 
 wsgi_app = "rsync_net_exporter:create_app()"
 
+# Each worker process keeps its own metrics; prometheus_client's multiprocess
+# mode has them write their values to files in this directory so that /metrics
+# can aggregate them, no matter which worker serves it. This must be set
+# before prometheus_client is first imported, which is why it's done here
+# rather than in an on_starting hook.
+if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(
+        prefix="rsync.net-exporter-metrics-"
+    )
+    _remove_multiproc_dir = True
+else:
+    _remove_multiproc_dir = False
+
+
+def on_starting(server):
+    # Values left over from a previous run would otherwise be included in the
+    # aggregation.
+    for p in Path(os.environ["PROMETHEUS_MULTIPROC_DIR"]).glob("*.db"):
+        p.unlink()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    if _remove_multiproc_dir:
+        shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+
+
 # pylint: skip-file
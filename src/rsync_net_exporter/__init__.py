@@ -1,12 +1,25 @@
 from importlib import metadata
+import os
 from typing import Final
 
 from flask import Flask
 from prometheus_flask_exporter import PrometheusMetrics  # type: ignore [import-untyped]
+from prometheus_flask_exporter.multiprocess import (  # type: ignore [import-untyped]
+    GunicornInternalPrometheusMetrics,
+)
 
 from . import (
+    capacity,
+    corpus,
     log_config,
     exporter,
+    feed,
+    parse_pool,
+    polling,
+    profiling,
+    state,
+    tracing,
+    upstream,
 )
 
 
@@ -14,16 +27,49 @@ def create_app(host: log_config.Host | None = None) -> Flask:
     if host is None:
         host = log_config.Host.detect()
 
-    host.configure_logging()
-
     app: Final = Flask(__name__)
 
     app.config.from_object(f"{__name__}.default_settings")
     app.config.from_prefixed_env()
 
+    host.configure_logging(app.config)
+
+    if app.config["TRACING_ENABLED"]:
+        tracing.init_app(app)
+
+    app.extensions["rsync_net_exporter.upstream"] = upstream.Upstream.from_config(
+        app.config
+    )
+    app.extensions["rsync_net_exporter.parser"] = (
+        parse_pool.PooledParser if app.config["PARSE_POOL_ENABLED"] else feed.Parser
+    ).from_config(app.config)
+    store: Final = state.StateStore.from_config(app.config)
+    app.extensions["rsync_net_exporter.capacity"] = (
+        capacity.CapacityTracker.from_config(app.config, store)
+    )
+    app.extensions["rsync_net_exporter.poller"] = (
+        polling.AdaptivePoller.from_config(app.config, store)
+        if app.config["ADAPTIVE_POLLING_ENABLED"]
+        else None
+    )
+    app.extensions["rsync_net_exporter.recorder"] = (
+        corpus.Recorder.from_config(app.config)
+        if app.config["RECORD_DIRECTORY"]
+        else None
+    )
+
     app.register_blueprint(exporter.exporter)
 
-    metrics: Final = PrometheusMetrics(app)
+    if app.config["PROFILING_ENABLED"]:
+        profiling.init_app(app)
+
+    # When running under gunicorn, gunicorn.conf.py sets
+    # PROMETHEUS_MULTIPROC_DIR so that /metrics covers all worker processes.
+    metrics: Final = (
+        GunicornInternalPrometheusMetrics(app)
+        if "PROMETHEUS_MULTIPROC_DIR" in os.environ
+        else PrometheusMetrics(app)
+    )
     metrics.info(
         "rsyncnet_exporter_info",
         "Information about rsync.net-exporter itself",
@@ -0,0 +1,130 @@
+import sys
+import threading
+from typing import Any, Final, Mapping
+
+from . import default_settings, state
+
+
+class GrowthEstimator:  # pylint: disable=too-many-instance-attributes
+    """
+    Estimates a rate of growth as the least-squares slope of the last `size`
+    observations, which are kept in a ring buffer. Running sums are maintained
+    so that each observation costs O(1); they are recomputed from the buffer
+    each time it wraps around, so that rounding errors don't accumulate.
+    """
+
+    def __init__(self, size: int) -> None:
+        if size < 2:
+            raise ValueError("size must be at least 2")
+        self.__ts: Final = [0.0] * size
+        self.__vs: Final = [0.0] * size
+        self.__next = 0
+        self.__count = 0
+        # Times are stored relative to an origin, to keep the sums small.
+        self.__origin: float | None = None
+        self.__sx = self.__sy = self.__sxx = self.__sxy = 0.0
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def add(self, t: float, v: float) -> None:
+        if self.__origin is None:
+            self.__origin = t
+        x: Final = t - self.__origin
+
+        if self.__count == len(self.__ts):
+            ox, ov = self.__ts[self.__next], self.__vs[self.__next]
+            self.__sx -= ox
+            self.__sy -= ov
+            self.__sxx -= ox * ox
+            self.__sxy -= ox * ov
+        else:
+            self.__count += 1
+
+        self.__ts[self.__next] = x
+        self.__vs[self.__next] = v
+        self.__sx += x
+        self.__sy += v
+        self.__sxx += x * x
+        self.__sxy += x * v
+
+        self.__next = (self.__next + 1) % len(self.__ts)
+        if self.__next == 0:
+            self.__rebase()
+
+    def __rebase(self) -> None:
+        assert self.__origin is not None  # nosec
+        shift: Final = min(self.__ts)
+        self.__origin += shift
+        for i, x in enumerate(self.__ts):
+            self.__ts[i] = x - shift
+        self.__sx = sum(self.__ts)
+        self.__sy = sum(self.__vs)
+        self.__sxx = sum(x * x for x in self.__ts)
+        self.__sxy = sum(x * v for x, v in zip(self.__ts, self.__vs))
+
+    def slope(self) -> float | None:
+        """
+        Returns the estimated rate of growth per unit time, or None if there
+        are too few observations (or they were all made at the same time).
+        """
+        n: Final = self.__count
+        denominator: Final = n * self.__sxx - self.__sx * self.__sx
+        if n < 2 or denominator <= 0:
+            return None
+        return (n * self.__sxy - self.__sx * self.__sy) / denominator
+
+
+class _Account:  # pylint: disable=too-few-public-methods
+    def __init__(self, size: int) -> None:
+        self.estimator: Final = GrowthEstimator(size)
+        self.pub_date: str | None = None
+
+
+class CapacityTracker:
+    """
+    Tracks the billed usage of each account over time (keyed by uid), in
+    order to estimate how quickly it is growing. Usage is only recorded when
+    the item's pubDate changes, i.e., when rsync.net has measured it again.
+    """
+
+    def __init__(
+        self,
+        window: int = default_settings.CAPACITY_WINDOW,
+        store: state.StateStore | None = None,
+    ) -> None:
+        self.__window: Final = window
+        self.__lock: Final = threading.Lock()
+        self.__accounts: Final = state.Namespace[_Account](
+            store if store is not None else state.StateStore(), "capacity"
+        )
+
+    @classmethod
+    def from_config(
+        cls, config: Mapping[str, Any], store: state.StateStore | None = None
+    ) -> "CapacityTracker":
+        return cls(config["CAPACITY_WINDOW"], store)
+
+    def observe(
+        self, uid: str, pub_date: str, t: float, billed_bytes: float
+    ) -> float | None:
+        """
+        Records an observation (if pub_date has changed since the last one)
+        and returns the estimated rate of growth of billed usage, in bytes per
+        second.
+        """
+        with self.__lock:
+            if (account := self.__accounts.get(uid)) is None:
+                # The estimator's buffers are allocated up front, but each
+                # observation will put two new floats in them.
+                account = _Account(self.__window)
+                self.__accounts.put(
+                    uid,
+                    account,
+                    state.approximate_size(account)
+                    + 2 * self.__window * sys.getsizeof(0.0),
+                )
+            if pub_date != account.pub_date:
+                account.pub_date = pub_date
+                account.estimator.add(t, billed_bytes)
+            return account.estimator.slope()
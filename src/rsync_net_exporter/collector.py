@@ -1,10 +1,12 @@
 from logging import getLogger
+import time
 from typing import Iterator, Final
-import xml.etree.ElementTree as ET  # nosec
 
 import prometheus_client
 from prometheus_client.core import GaugeMetricFamily
-import requests
+
+from . import capacity, corpus, feed, polling, tracing
+from .upstream import Upstream
 
 
 LOGGER: Final = getLogger(__name__)
@@ -13,8 +15,21 @@ LOGGER: Final = getLogger(__name__)
 class Collector(
     prometheus_client.registry.Collector
 ):  # pylint: disable=too-many-instance-attributes
-    def __init__(self, target: str) -> None:
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        target: str,
+        upstream: Upstream | None = None,
+        parser: feed.Parser | None = None,
+        capacity_tracker: capacity.CapacityTracker | None = None,
+        poller: polling.AdaptivePoller | None = None,
+        recorder: corpus.Recorder | None = None,
+    ) -> None:
         self.__target: Final = target
+        self.__upstream: Final = upstream or Upstream()
+        self.__parser: Final = parser or feed.Parser()
+        self.__capacity_tracker: Final = capacity_tracker
+        self.__poller: Final = poller
+        self.__recorder: Final = recorder
         self.__labelnames: Final = ["uid", "nickname", "location"]
         self.__mf_quota: Final = GaugeMetricFamily(
             "rsyncnet_account_quota_bytes", "Account quota", labels=self.__labelnames
@@ -49,29 +64,26 @@ class Collector(
             "Length of time that account has been idle",
             labels=self.__labelnames,
         )
+        self.__mf_growth: Final = GaugeMetricFamily(
+            "rsyncnet_account_billed_growth_bytes_per_second",
+            "Rate of growth of billed data, smoothed over recent measurements",
+            labels=self.__labelnames,
+        )
+        self.__mf_quota_full: Final = GaugeMetricFamily(
+            "rsyncnet_account_quota_full_seconds",
+            "Projected time until billed data reaches quota at its current rate of growth",
+            labels=self.__labelnames,
+        )
 
     def collect(self) -> Iterator[prometheus_client.Metric]:
-        resp: Final = requests.get(self.__target, timeout=5)
-        resp.raise_for_status()
+        parsed: Final = self.__cached() or self.__fetch()
 
-        root: Final = ET.fromstring(resp.text)  # nosec
-        if root.tag != "rss":
-            raise CollectorException(
-                f"Got XML but with unexpected root element {root.tag!r}"
-            )
-
-        nitems = 0
-        for item in root.iterfind("channel/item"):
-            if not item.findtext("uid"):
-                LOGGER.debug("Skipping item %r", item.findtext("title"))
-                continue
-
-            nitems += 1
-            self.collect_account(item)
-
-        if nitems == 0:
+        if not parsed.accounts:
             raise CollectorException("Got RSS without any /rss/channel/item elements")
 
+        for account in parsed.accounts:
+            self.collect_account(account)
+
         yield self.__mf_quota
         yield self.__mf_billed
         yield self.__mf_dataset
@@ -79,36 +91,72 @@ class Collector(
         yield self.__mf_snap_used_free
         yield self.__mf_snap_used_custom
         yield self.__mf_idle
+        if self.__capacity_tracker is not None:
+            yield self.__mf_growth
+            yield self.__mf_quota_full
 
-    def collect_account(self, item: ET.Element) -> None:
-        labelvalues: Final = []
-        for labelname in self.__labelnames:
-            labelvalues.append(item.findtext(labelname) or "")
+    def __cached(self) -> feed.Feed | None:
+        return self.__poller.cached(self.__target) if self.__poller else None
 
-        if quota_gb := item.findtext("quota_gb"):
-            self.__mf_quota.add_metric(labelvalues, float(quota_gb) * 2**30)
+    def __fetch(self) -> feed.Feed:
+        with tracing.span("fetch"):
+            response: Final = self.__upstream.fetch_response(self.__target)
 
-        if billed_gb := item.findtext("billed_gb"):
-            self.__mf_billed.add_metric(labelvalues, float(billed_gb) * 2**30)
+        with tracing.span("parse"):
+            try:
+                parsed: Final = self.__parser.parse(response.body)
+            except feed.FeedError as e:
+                raise CollectorException(str(e)) from e
 
-        if dataset_bytes := item.findtext("dataset_bytes"):
-            self.__mf_dataset.add_metric(labelvalues, float(dataset_bytes))
+        # Only documents that the parser has accepted (and so are within its
+        # limits) are recorded.
+        if self.__recorder is not None:
+            self.__recorder.record(self.__target, response)
 
-        if inodes := item.findtext("inodes"):
-            self.__mf_inodes.add_metric(labelvalues, float(inodes))
+        if self.__poller is not None:
+            self.__poller.update(self.__target, parsed)
+        return parsed
 
-        if snap_used_free_gb := item.findtext("snap_used_free_gb"):
-            self.__mf_snap_used_free.add_metric(
-                labelvalues, float(snap_used_free_gb) * 2**30
-            )
+    def collect_account(self, account: feed.Account) -> None:
+        labelvalues: Final = [account.uid, account.nickname, account.location]
 
-        snap_used_cust_gb: Final = item.findtext("snap_used_cust_gb") or "0"
-        self.__mf_snap_used_custom.add_metric(
-            labelvalues, float(snap_used_cust_gb) * 2**30
-        )
+        if account.quota is not None:
+            self.__mf_quota.add_metric(labelvalues, account.quota)
+
+        if account.billed is not None:
+            self.__mf_billed.add_metric(labelvalues, account.billed)
+
+        if account.dataset is not None:
+            self.__mf_dataset.add_metric(labelvalues, account.dataset)
+
+        if account.inodes is not None:
+            self.__mf_inodes.add_metric(labelvalues, account.inodes)
 
-        if usage_idle_days := item.findtext("usage_idle_days"):
-            self.__mf_idle.add_metric(labelvalues, float(usage_idle_days) * 86400)
+        if account.snap_used_free is not None:
+            self.__mf_snap_used_free.add_metric(labelvalues, account.snap_used_free)
+
+        self.__mf_snap_used_custom.add_metric(labelvalues, account.snap_used_custom)
+
+        if account.idle is not None:
+            self.__mf_idle.add_metric(labelvalues, account.idle)
+
+        if (
+            self.__capacity_tracker is not None
+            and account.billed is not None
+            and account.pub_date
+        ):
+            growth: Final = self.__capacity_tracker.observe(
+                account.uid,
+                account.pub_date,
+                feed.parse_date(account.pub_date) or time.time(),
+                account.billed,
+            )
+            if growth is not None:
+                self.__mf_growth.add_metric(labelvalues, growth)
+                if account.quota is not None and growth > 0:
+                    self.__mf_quota_full.add_metric(
+                        labelvalues, max(account.quota - account.billed, 0) / growth
+                    )
 
 
 class CollectorException(Exception):
@@ -0,0 +1,157 @@
+"""
+Records the responses fetched from upstream into a corpus that can be shared
+and replayed (see replay.py), for benchmarking against realistic data.
+
+Identifying details are replaced with pseudonyms derived from a secret key
+with HMAC, so that the same uid (for instance) always gets the same pseudonym
+within a corpus, but can't be recovered from it.
+"""
+
+import hashlib
+import hmac
+import json
+from logging import getLogger
+import os
+from pathlib import Path
+import secrets
+import threading
+import time
+from typing import Any, Final, Iterator, Mapping, NamedTuple
+from urllib.parse import urlsplit
+import xml.etree.ElementTree as ET  # nosec
+
+from .upstream import Response
+
+
+LOGGER: Final = getLogger(__name__)
+
+# Elements of an item whose text identifies an account. The title of an
+# account's item is its uid.
+_SCRUBBED_ELEMENTS: Final = ["uid", "nickname", "gr", "title"]
+
+# Response headers that are kept; anything else might identify the client or
+# describe an encoding of the body that no longer applies.
+_KEPT_HEADERS: Final = ["Content-Type", "Cache-Control", "Expires", "Last-Modified"]
+
+
+class Entry(NamedTuple):
+    """
+    A recorded response. elapsed is the time until its headers were received,
+    and duration the time until its body had been read.
+    """
+
+    path: str
+    recorded: float
+    status: int
+    headers: dict[str, str]
+    elapsed: float
+    duration: float
+    body: str
+
+
+class Scrubber:
+    def __init__(self, key: bytes) -> None:
+        self.__key: Final = key
+
+    def pseudonym(self, value: str, prefix: str = "") -> str:
+        digest: Final = hmac.new(self.__key, value.encode(), hashlib.sha256)
+        return prefix + digest.hexdigest()[:12]
+
+    def path(self, url: str) -> str:
+        """
+        Returns a replacement for the path of url, which contains the secret
+        that grants access to the feed.
+        """
+        return f"/rss/{self.pseudonym(urlsplit(url).path)}"
+
+    def body(self, body: bytes) -> str:
+        """
+        Replaces the text of each element that identifies an account with a
+        pseudonym, leaving the rest of the document alone. body must already
+        have been accepted by feed.Parser, which enforces limits on its size
+        and complexity. Raises ValueError if it can't be parsed, and so can't
+        be scrubbed.
+        """
+        if b"<!DOCTYPE" in body:
+            raise ValueError("Document has a DOCTYPE declaration")
+        try:
+            root: Final = ET.fromstring(body)  # nosec
+        except ET.ParseError as e:
+            raise ValueError(str(e)) from e
+
+        for item in root.iterfind("channel/item"):
+            if not item.findtext("uid"):
+                # Such as the item for the total usage of all accounts.
+                continue
+            for name in _SCRUBBED_ELEMENTS:
+                for elem in item.iter(name):
+                    if elem.text:
+                        elem.text = self.pseudonym(elem.text, "x")
+
+        return ET.tostring(root, encoding="unicode", xml_declaration=True)
+
+
+class Recorder:  # pylint: disable=too-few-public-methods
+    """
+    Appends scrubbed responses, as JSON lines, to a file in directory. Each
+    process writes to its own file, so that gunicorn workers don't interleave
+    their writes.
+    """
+
+    def __init__(self, directory: Path, key: bytes) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        self.__directory: Final = directory
+        self.__scrubber: Final = Scrubber(key)
+        self.__lock: Final = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "Recorder":
+        key: Final = config["RECORD_KEY"]
+        if not key:
+            LOGGER.warning(
+                "RECORD_KEY is not set; pseudonyms will differ between processes"
+            )
+        return cls(
+            Path(config["RECORD_DIRECTORY"]),
+            key.encode() if key else secrets.token_bytes(32),
+        )
+
+    def record(self, url: str, response: Response) -> None:
+        """
+        Records response, which was fetched from url. Its body must already
+        have been parsed successfully by feed.Parser.
+        """
+        try:
+            scrubbed: Final = self.__scrubber.body(response.body)
+        except ValueError as e:
+            LOGGER.warning("Not recording response from upstream: %s", e)
+            return
+
+        entry: Final = Entry(
+            path=self.__scrubber.path(url),
+            recorded=time.time(),
+            status=response.status,
+            headers={
+                k: response.headers[k] for k in _KEPT_HEADERS if k in response.headers
+            },
+            elapsed=response.elapsed,
+            duration=response.duration,
+            body=scrubbed,
+        )
+        line: Final = json.dumps(entry._asdict()) + "\n"
+        with self.__lock:
+            with open(
+                self.__directory / f"{os.getpid()}.jsonl", "a", encoding="utf-8"
+            ) as f:
+                f.write(line)
+
+
+def load(directory: Path) -> Iterator[Entry]:
+    """
+    Yields the entries of a corpus in the order in which they were recorded.
+    """
+    entries: Final[list[Entry]] = []
+    for path in sorted(directory.glob("*.jsonl")):
+        with open(path, encoding="utf-8") as f:
+            entries.extend(Entry(**json.loads(line)) for line in f if line.strip())
+    yield from sorted(entries, key=lambda e: e.recorded)
@@ -0,0 +1,276 @@
+"""
+Runs the exporter as a daemon that probes a fixed list of targets on a
+schedule, and pushes the results to a Pushgateway and/or writes them to a file
+for node_exporter's textfile collector. This takes rsync.net's latency off the
+scrape path entirely.
+
+    python -m rsync_net_exporter.daemon --textfile=/var/lib/node_exporter/rsync.net.prom TARGET...
+
+Settings such as DNS_CACHE_ENABLED are read from the environment as they are
+for the web app.
+"""
+
+import abc
+import argparse
+import hashlib
+from logging import getLogger
+import os
+from pathlib import Path
+import signal
+import sys
+import tempfile
+import threading
+import time
+from types import FrameType
+from typing import Final, Iterable, Iterator, Sequence
+
+from flask import Config
+import prometheus_client
+from prometheus_client.exposition import push_to_gateway
+from prometheus_client.metrics_core import Metric
+
+from . import (
+    capacity,
+    collector,
+    corpus,
+    feed,
+    log_config,
+    parse_pool,
+    polling,
+    state,
+)
+from .upstream import Upstream
+
+
+LOGGER: Final = getLogger(__name__)
+
+
+class MergedCollector(
+    prometheus_client.registry.Collector
+):  # pylint: disable=too-few-public-methods
+    """
+    Combines the metrics collected from several targets into a single set of
+    metric families, distinguishing them with a "target" label.
+    """
+
+    def __init__(self, families_by_target: dict[str, list[Metric]]) -> None:
+        self.__families_by_target: Final = families_by_target
+
+    def collect(self) -> Iterator[Metric]:
+        merged: Final[dict[str, Metric]] = {}
+
+        success: Final = Metric(
+            "rsyncnet_probe_success",
+            "Whether the target was probed successfully",
+            "gauge",
+        )
+        for target, families in self.__families_by_target.items():
+            success.add_sample(
+                "rsyncnet_probe_success", {"target": target}, 1 if families else 0
+            )
+            for family in families:
+                if (m := merged.get(family.name)) is None:
+                    m = merged[family.name] = Metric(
+                        family.name, family.documentation, family.type
+                    )
+                for sample in family.samples:
+                    m.add_sample(
+                        sample.name, {**sample.labels, "target": target}, sample.value
+                    )
+
+        yield success
+        yield from merged.values()
+
+
+class Output(abc.ABC):  # pylint: disable=too-few-public-methods
+    """
+    Somewhere to send the rendered metrics. Identical data is not sent again,
+    unless it was last sent more than max_unchanged seconds ago.
+    """
+
+    def __init__(self, max_unchanged: float) -> None:
+        self.__max_unchanged: Final = max_unchanged
+        self.__last_digest: bytes | None = None
+        self.__last_sent = 0.0
+
+    def send(self, registry: prometheus_client.CollectorRegistry, data: bytes) -> None:
+        digest: Final = hashlib.sha256(data).digest()
+        now: Final = time.monotonic()
+        if (
+            digest == self.__last_digest
+            and now - self.__last_sent < self.__max_unchanged
+        ):
+            LOGGER.debug("%s: data unchanged, skipping", self)
+            return
+
+        self._send(registry, data)
+        self.__last_digest = digest
+        self.__last_sent = now
+
+    @abc.abstractmethod
+    def _send(
+        self, registry: prometheus_client.CollectorRegistry, data: bytes
+    ) -> None: ...
+
+
+class TextfileOutput(Output):
+    def __init__(self, path: Path, max_unchanged: float) -> None:
+        super().__init__(max_unchanged)
+        self.__path: Final = path
+
+    def __str__(self) -> str:
+        return f"textfile {str(self.__path)!r}"
+
+    def _send(self, registry: prometheus_client.CollectorRegistry, data: bytes) -> None:
+        # Write to a temporary file in the same directory and rename it into
+        # place, so that node_exporter never reads a partially-written file.
+        fd, tmp = tempfile.mkstemp(
+            dir=self.__path.parent, prefix=f".{self.__path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.__path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        LOGGER.info("Wrote %s", self)
+
+
+class PushgatewayOutput(Output):
+    def __init__(self, gateway: str, job: str, max_unchanged: float) -> None:
+        super().__init__(max_unchanged)
+        self.__gateway: Final = gateway
+        self.__job: Final = job
+
+    def __str__(self) -> str:
+        return f"pushgateway {self.__gateway!r}"
+
+    def _send(self, registry: prometheus_client.CollectorRegistry, data: bytes) -> None:
+        # All targets are pushed in a single request, replacing the previous
+        # contents of the job's group.
+        push_to_gateway(self.__gateway, self.__job, registry, timeout=10)
+        LOGGER.info("Pushed to %s", self)
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+def run_once(
+    targets: Iterable[str],
+    upstream: Upstream,
+    parser: feed.Parser,
+    capacity_tracker: capacity.CapacityTracker,
+    outputs: Iterable[Output],
+    poller: polling.AdaptivePoller | None = None,
+    recorder: corpus.Recorder | None = None,
+) -> None:
+    families_by_target: Final[dict[str, list[Metric]]] = {}
+    for target in targets:
+        try:
+            families_by_target[target] = list(
+                collector.Collector(
+                    target, upstream, parser, capacity_tracker, poller, recorder
+                ).collect()
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            LOGGER.exception("Failed to probe %r", target)
+            families_by_target[target] = []
+
+    registry: Final = prometheus_client.CollectorRegistry()
+    registry.register(MergedCollector(families_by_target))
+    data: Final = prometheus_client.generate_latest(registry)
+
+    for output in outputs:
+        try:
+            output.send(registry, data)
+        except Exception:  # pylint: disable=broad-exception-caught
+            LOGGER.exception("Failed to send to %s", output)
+
+
+def main(argv: Sequence[str]) -> int:
+    parser: Final = argparse.ArgumentParser(
+        prog="python -m rsync_net_exporter.daemon",
+        description=(__doc__ or "").strip().split("\n\n", maxsplit=1)[0],
+    )
+    parser.add_argument("targets", metavar="TARGET", nargs="+", help="RSS URL to probe")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=300,
+        help="seconds between probes (default: %(default)s)",
+    )
+    parser.add_argument("--textfile", type=Path, help="write metrics to this file")
+    parser.add_argument("--pushgateway", help="push metrics to this Pushgateway")
+    parser.add_argument(
+        "--job", default="rsync.net", help="Pushgateway job name (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--max-unchanged",
+        type=float,
+        default=3600,
+        help="send unchanged data again after this many seconds, so that its consumer can tell that the daemon is still alive (default: %(default)s)",
+    )
+    parser.add_argument("--once", action="store_true", help="probe once, then exit")
+    args: Final = parser.parse_args(argv)
+
+    outputs: Final[list[Output]] = []
+    if args.textfile:
+        outputs.append(TextfileOutput(args.textfile, args.max_unchanged))
+    if args.pushgateway:
+        outputs.append(
+            PushgatewayOutput(args.pushgateway, args.job, args.max_unchanged)
+        )
+    if not outputs:
+        parser.error("at least one of --textfile or --pushgateway is required")
+
+    config: Final = Config(os.getcwd())
+    config.from_object(f"{__package__}.default_settings")
+    config.from_prefixed_env()
+
+    log_config.Host.DAEMON.configure_logging(config)
+
+    upstream: Final = Upstream.from_config(config)
+    feed_parser: Final = (
+        parse_pool.PooledParser if config["PARSE_POOL_ENABLED"] else feed.Parser
+    ).from_config(config)
+    store: Final = state.StateStore.from_config(config)
+    capacity_tracker: Final = capacity.CapacityTracker.from_config(config, store)
+    poller: Final = (
+        polling.AdaptivePoller.from_config(config, store)
+        if config["ADAPTIVE_POLLING_ENABLED"]
+        else None
+    )
+    recorder: Final = (
+        corpus.Recorder.from_config(config) if config["RECORD_DIRECTORY"] else None
+    )
+
+    stop: Final = threading.Event()
+
+    def on_signal(signum: int, _frame: FrameType | None) -> None:
+        LOGGER.info("Received %s, exiting", signal.Signals(signum).name)
+        stop.set()
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    deadline = time.monotonic()
+    while not stop.is_set():
+        run_once(
+            args.targets,
+            upstream,
+            feed_parser,
+            capacity_tracker,
+            outputs,
+            poller,
+            recorder,
+        )
+        if args.once:
+            break
+        deadline += args.interval
+        stop.wait(max(0.0, deadline - time.monotonic()))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
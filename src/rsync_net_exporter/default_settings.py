@@ -1,3 +1,98 @@
 from typing import Final
 
 RSYNC_NET_HOST: Final = "www.rsync.net"
+
+# Cache name lookups for RSYNC_NET_HOST in-process, rather than asking the
+# system resolver before every probe. Answers are kept for their TTL, clamped
+# between DNS_CACHE_MIN_TTL and DNS_CACHE_MAX_TTL seconds. DNS_CACHE_RESOLVER is
+# "system" (getaddrinfo, which doesn't report TTLs, so answers are kept for
+# DNS_CACHE_MAX_TTL), "dnspython" (which needs the dnspython package), or the
+# import path of a callable that takes a host and port and returns a list of
+# addresses and a TTL.
+DNS_CACHE_ENABLED: Final = False
+DNS_CACHE_RESOLVER: Final = "system"
+DNS_CACHE_MIN_TTL: Final = 5
+DNS_CACHE_MAX_TTL: Final = 300
+
+# Expose /debug/profile, which profiles this worker on demand. Requests to it
+# must carry "Authorization: Bearer <PROFILING_TOKEN>".
+PROFILING_ENABLED: Final = False
+PROFILING_TOKEN: Final = ""
+PROFILING_MAX_SECONDS: Final = 300
+PROFILING_SAMPLE_INTERVAL: Final = 0.01
+
+# Record a trace of each probe. TRACING_EXPORTER is "file" (which writes spans
+# to TRACING_FILE as JSON lines, or to standard error if it is "-"), "memory",
+# or the import path of a callable that takes the app's config and returns an
+# exporter.
+TRACING_ENABLED: Final = False
+TRACING_EXPORTER: Final = "file"
+TRACING_FILE: Final = "-"
+
+# Limits on the size and complexity of documents fetched from rsync.net, so
+# that a misbehaving upstream (or a proxy's error page) can't balloon a
+# worker's memory.
+MAX_RESPONSE_BYTES: Final = 8 * 2**20
+MAX_XML_ELEMENTS: Final = 200_000
+MAX_XML_DEPTH: Final = 8
+
+# The number of measurements of each account's usage (i.e., distinct values of
+# its item's pubDate) over which its rate of growth is estimated.
+CAPACITY_WINDOW: Final = 64
+
+# Learn how often rsync.net regenerates each target's feed (from the pubDate of
+# its items), and only fetch it again when a new build is expected, serving the previous result in between.
+# The time between fetches of a target is kept between POLL_MIN_INTERVAL and
+# POLL_MAX_INTERVAL seconds.
+ADAPTIVE_POLLING_ENABLED: Final = False
+POLL_MIN_INTERVAL: Final = 60
+POLL_MAX_INTERVAL: Final = 3600
+
+# Log records are handed to a queue of up to LOG_QUEUE_SIZE records and
+# written by a background thread; if the queue is full, records are dropped
+# rather than blocking. LOG_FORMAT is "text" or "json". Access log lines and
+# debug messages can be limited to a number per second (for each distinct
+# message), with bursts of up to LOG_RATE_LIMIT_BURST; 0 means no limit.
+LOG_FORMAT: Final = "text"
+LOG_QUEUE_SIZE: Final = 10_000
+LOG_ACCESS_RATE_LIMIT: Final = 0
+LOG_DEBUG_RATE_LIMIT: Final = 0
+LOG_RATE_LIMIT_BURST: Final = 10
+
+# Parse documents of at least PARSE_POOL_THRESHOLD bytes in a pool of
+# PARSE_POOL_PROCESSES processes, so that parsing a large feed doesn't stall
+# the worker's other threads. Up to PARSE_POOL_MAX_QUEUED documents may be
+# waiting for the pool at once; beyond that they're parsed in-process.
+PARSE_POOL_ENABLED: Final = False
+PARSE_POOL_PROCESSES: Final = 2
+PARSE_POOL_MAX_QUEUED: Final = 8
+PARSE_POOL_THRESHOLD: Final = 256 * 2**10
+
+# Limit fetches from each upstream host to RATE_LIMIT_RATE per second, with
+# bursts of up to RATE_LIMIT_BURST. Waiting fetches are served in round-robin
+# order of target; one that would wait more than RATE_LIMIT_MAX_WAIT seconds
+# fails instead. The limit is kept in memory, so it applies to each worker
+# process separately: to limit a host to N fetches per second overall, set
+# RATE_LIMIT_RATE (and RATE_LIMIT_BURST) to N divided by the number of gunicorn
+# workers.
+RATE_LIMIT_ENABLED: Final = False
+RATE_LIMIT_RATE: Final = 1.0
+RATE_LIMIT_BURST: Final = 5
+RATE_LIMIT_MAX_WAIT: Final = 10
+
+# Record each response fetched from upstream, scrubbed of identifying details,
+# into a corpus in RECORD_DIRECTORY that can be replayed with
+# "python -m rsync_net_exporter.replay". Pseudonyms are derived from
+# RECORD_KEY, which should be kept secret; if it isn't set, a random key is
+# used (so pseudonyms differ between processes).
+RECORD_DIRECTORY: Final = ""
+RECORD_KEY: Final = ""
+
+# Limits on the state kept about each target and account (such as cached
+# feeds and usage history), so that memory use doesn't grow with the number
+# of distinct targets probed. The least recently used entries are evicted
+# beyond STATE_MAX_ENTRIES entries or STATE_MAX_BYTES bytes (approximately),
+# and entries unused for STATE_TTL seconds are evicted too.
+STATE_MAX_ENTRIES: Final = 10_000
+STATE_MAX_BYTES: Final = 64 * 2**20
+STATE_TTL: Final = 86400
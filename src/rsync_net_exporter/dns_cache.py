@@ -0,0 +1,156 @@
+import ipaddress
+from logging import getLogger
+import socket
+import threading
+import time
+from typing import Any, Callable, Final, Mapping, NamedTuple, TypeAlias
+
+import prometheus_client
+from werkzeug.utils import import_string
+
+
+LOGGER: Final = getLogger(__name__)
+
+Resolver: TypeAlias = Callable[[str, int], tuple[list[str], float | None]]
+"""
+Resolves a host name and port to a list of addresses, and the TTL (in seconds)
+of the answer if known.
+"""
+
+REQUESTS: Final = prometheus_client.Counter(
+    "rsyncnet_exporter_dns_cache_requests",
+    "Name lookups served by the DNS cache",
+    ["result"],
+)
+REQUESTS_HIT: Final = REQUESTS.labels("hit")
+REQUESTS_MISS: Final = REQUESTS.labels("miss")
+REQUESTS_STALE: Final = REQUESTS.labels("stale")
+
+RESOLUTION_FAILURES: Final = prometheus_client.Counter(
+    "rsyncnet_exporter_dns_resolution_failures",
+    "Name lookups that could not be resolved",
+)
+
+RESOLUTION_SECONDS: Final = prometheus_client.Histogram(
+    "rsyncnet_exporter_dns_resolution_seconds",
+    "Time taken to resolve names that were not in the DNS cache",
+)
+
+
+def system_resolver(host: str, port: int) -> tuple[list[str], float | None]:
+    """
+    Resolve using the system resolver. getaddrinfo doesn't tell us the TTL of
+    the records it returns, so the caller has to make do without it.
+    """
+    addresses: Final[list[str]] = []
+    for _, _, _, _, sockaddr in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM):
+        if (address := str(sockaddr[0])) not in addresses:
+            addresses.append(address)
+    return addresses, None
+
+
+def dnspython_resolver(
+    host: str, port: int  # pylint: disable=unused-argument
+) -> tuple[list[str], float | None]:
+    """
+    Resolve using dnspython (which has to be installed separately), which,
+    unlike the system resolver, reports the TTL of its answers. port is
+    ignored.
+    """
+    # pylint: disable=import-outside-toplevel
+    import dns.exception
+    import dns.resolver
+
+    # pylint: enable=import-outside-toplevel
+
+    addresses: Final[list[str]] = []
+    ttls: Final[list[float]] = []
+    for rdtype in ["A", "AAAA"]:
+        try:
+            answer = dns.resolver.resolve(host, rdtype)
+        except dns.resolver.NoAnswer:
+            continue
+        except dns.exception.DNSException as e:
+            raise OSError(f"Failed to resolve {host!r}: {e}") from e
+        addresses.extend(str(rdata.address) for rdata in answer)
+        ttls.append(answer.rrset.ttl if answer.rrset is not None else 0)
+    if not addresses:
+        raise OSError(f"No addresses found for {host!r}")
+    return addresses, min(ttls)
+
+
+_RESOLVERS: Final[dict[str, Resolver]] = {
+    "system": system_resolver,
+    "dnspython": dnspython_resolver,
+}
+
+
+class _Entry(NamedTuple):
+    addresses: list[str]
+    expires: float
+
+
+class DnsCache:  # pylint: disable=too-few-public-methods
+    """
+    Caches name lookups in-process. Answers are kept for their TTL, clamped
+    between min_ttl and max_ttl (or for max_ttl if the resolver doesn't know
+    the TTL, as the system resolver doesn't). If resolution fails, the last
+    good answer continues to be used.
+    """
+
+    def __init__(
+        self,
+        min_ttl: float,
+        max_ttl: float,
+        resolver: Resolver = system_resolver,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.__min_ttl: Final = min_ttl
+        self.__max_ttl: Final = max_ttl
+        self.__resolver: Final = resolver
+        self.__clock: Final = clock
+        self.__lock: Final = threading.Lock()
+        self.__entries: Final[dict[tuple[str, int], _Entry]] = {}
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "DnsCache":
+        name: Final = config["DNS_CACHE_RESOLVER"]
+        resolver: Final[Resolver] = (
+            _RESOLVERS[name] if name in _RESOLVERS else import_string(name)
+        )
+        return cls(config["DNS_CACHE_MIN_TTL"], config["DNS_CACHE_MAX_TTL"], resolver)
+
+    def resolve(self, host: str, port: int) -> list[str]:
+        try:
+            ipaddress.ip_address(host)
+        except ValueError:
+            pass
+        else:
+            return [host]
+
+        key: Final = (host, port)
+        with self.__lock:
+            entry = self.__entries.get(key)
+        if entry is not None and entry.expires > self.__clock():
+            REQUESTS_HIT.inc()
+            return entry.addresses
+
+        try:
+            with RESOLUTION_SECONDS.time():
+                addresses, ttl = self.__resolver(host, port)
+        except OSError:
+            RESOLUTION_FAILURES.inc()
+            if entry is None:
+                raise
+            LOGGER.warning(
+                "Failed to resolve %r, using last good answer", host, exc_info=True
+            )
+            REQUESTS_STALE.inc()
+            return entry.addresses
+
+        REQUESTS_MISS.inc()
+        ttl = self.__max_ttl if ttl is None else ttl
+        expires: Final = self.__clock() + min(max(ttl, self.__min_ttl), self.__max_ttl)
+        with self.__lock:
+            self.__entries[key] = _Entry(addresses, expires)
+        return addresses
@@ -1,28 +1,52 @@
 from urllib.parse import urlsplit
-from typing import Final
+from typing import Final, Iterable, Iterator
 
 from flask import Blueprint, current_app, request
 from flask.typing import ResponseReturnValue
 import prometheus_client
+from prometheus_client.metrics_core import Metric
+from prometheus_client.registry import Collector
 
-from . import collector
+from . import collector, tracing
 
 
 exporter: Final = Blueprint("exporter", __name__)  # pylint: disable=invalid-name
 
 
+class _Collected(Collector):  # pylint: disable=too-few-public-methods
+    """
+    Serves metrics that have already been collected.
+    """
+
+    def __init__(self, metrics: Iterable[Metric]) -> None:
+        self.__metrics: Final = list(metrics)
+
+    def collect(self) -> Iterator[Metric]:
+        return iter(self.__metrics)
+
+
 @exporter.route("/probe")
 def probe() -> ResponseReturnValue:
     if not (target := request.args.get("target")):
         return "Missing parameter: 'target'", 400
 
-    netloc: Final = urlsplit(target).netloc
-    netloc_t: Final = netloc.partition(":")
-    if netloc_t[0] != current_app.config["RSYNC_NET_HOST"]:
-        return "'target' points to forbidden host", 403
-
-    col: Final = collector.Collector(target)
-
+    with tracing.span("allowlist"):
+        netloc: Final = urlsplit(target).netloc
+        netloc_t: Final = netloc.partition(":")
+        if netloc_t[0] != current_app.config["RSYNC_NET_HOST"]:
+            return "'target' points to forbidden host", 403
+
+    col: Final = collector.Collector(
+        target,
+        current_app.extensions["rsync_net_exporter.upstream"],
+        current_app.extensions["rsync_net_exporter.parser"],
+        current_app.extensions["rsync_net_exporter.capacity"],
+        current_app.extensions["rsync_net_exporter.poller"],
+        current_app.extensions["rsync_net_exporter.recorder"],
+    )
+
+    # Collected before the response is rendered, so that the render span
+    # covers only the serialisation of the metrics.
     reg: Final = prometheus_client.CollectorRegistry()
-    reg.register(col)
-    return prometheus_client.make_wsgi_app(reg)
+    reg.register(_Collected(col.collect()))
+    return tracing.wrap_wsgi("render", prometheus_client.make_wsgi_app(reg))
@@ -0,0 +1,220 @@
+import datetime
+import email.utils
+import functools
+from logging import getLogger
+from typing import Any, Final, Iterator, Mapping, NamedTuple
+import xml.etree.ElementTree as ET  # nosec
+import zoneinfo
+
+import prometheus_client
+
+from . import default_settings, tracing
+
+
+LOGGER: Final = getLogger(__name__)
+
+ABORTS: Final = prometheus_client.Counter(
+    "rsyncnet_exporter_parse_aborts",
+    "Documents whose parsing was abandoned because they exceeded a limit",
+    ["reason"],
+)
+
+_CHUNK_SIZE: Final = 64 * 1024
+
+# Time zone abbreviations used by rsync.net that email.utils doesn't know.
+_TIME_ZONES: Final = {
+    "PT": "America/Los_Angeles",
+}
+
+
+class FeedError(Exception):
+    pass
+
+
+class ParseLimitExceeded(FeedError):
+    def __init__(self, reason: str, message: str) -> None:
+        super().__init__(message)
+        self.reason: Final = reason
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (type(self), (self.reason, str(self)))
+
+
+class Account(NamedTuple):
+    """
+    The usage of a storage account, decoded from an item in the feed.
+    Quantities are in bytes and seconds.
+    """
+
+    uid: str
+    nickname: str
+    location: str
+    pub_date: str | None
+    quota: float | None
+    billed: float | None
+    dataset: float | None
+    inodes: float | None
+    snap_used_free: float | None
+    snap_used_custom: float
+    idle: float | None
+
+
+class Feed(NamedTuple):
+    last_build_date: str | None
+    accounts: list[Account]
+
+
+def decode_account(item: ET.Element) -> Account | None:
+    """
+    Returns None for items that don't describe an account (such as the total
+    usage of all accounts).
+    """
+    if not (uid := item.findtext("uid")):
+        return None
+
+    def number(name: str, scale: float = 1) -> float | None:
+        return float(text) * scale if (text := item.findtext(name)) else None
+
+    return Account(
+        uid=uid,
+        nickname=item.findtext("nickname") or "",
+        location=item.findtext("location") or "",
+        pub_date=item.findtext("pubDate"),
+        quota=number("quota_gb", 2**30),
+        billed=number("billed_gb", 2**30),
+        dataset=number("dataset_bytes"),
+        inodes=number("inodes"),
+        snap_used_free=number("snap_used_free_gb", 2**30),
+        snap_used_custom=number("snap_used_cust_gb", 2**30) or 0.0,
+        idle=number("usage_idle_days", 86400),
+    )
+
+
+class Parser:  # pylint: disable=too-few-public-methods
+    """
+    Parses rsync.net's RSS feed incrementally, so that the whole element tree
+    is never held in memory at once, and so that parsing is abandoned as soon
+    as the document exceeds the configured limits on element count or depth.
+    """
+
+    def __init__(
+        self,
+        max_elements: int = default_settings.MAX_XML_ELEMENTS,
+        max_depth: int = default_settings.MAX_XML_DEPTH,
+    ) -> None:
+        self.__max_elements: Final = max_elements
+        self.__max_depth: Final = max_depth
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "Parser":
+        return cls(config["MAX_XML_ELEMENTS"], config["MAX_XML_DEPTH"])
+
+    def parse(self, body: bytes) -> Feed:
+        try:
+            return self.parse_uncounted(body)
+        except ParseLimitExceeded as e:
+            ABORTS.labels(e.reason).inc()
+            raise
+
+    def parse_uncounted(self, body: bytes) -> Feed:
+        """
+        Like parse, but doesn't count aborted parses; for use in processes
+        whose metrics aren't collected.
+        """
+        last_build_date: str | None = None
+        accounts: Final[list[Account]] = []
+
+        for elem in self.__channel_children(body):
+            if elem.tag == "lastBuildDate":
+                last_build_date = elem.text
+            elif elem.tag == "item":
+                with tracing.span("decode"):
+                    account = decode_account(elem)
+                if account is None:
+                    LOGGER.debug("Skipping item %r", elem.findtext("title"))
+                else:
+                    accounts.append(account)
+
+        return Feed(last_build_date, accounts)
+
+    def __channel_children(self, body: bytes) -> Iterator[ET.Element]:
+        """
+        Yields each child of /rss/channel. An element is cleared once the
+        caller has finished with it.
+        """
+        # RSS has no need of a DTD, and without one the only entities that
+        # can appear are the five predefined ones, so entity expansion can't
+        # be used to make the parser do an unbounded amount of work.
+        if b"<!DOCTYPE" in body:
+            raise ParseLimitExceeded("doctype", "Document has a DOCTYPE declaration")
+
+        # pylint: disable-next=unsubscriptable-object
+        parser: Final[ET.XMLPullParser[ET.Element]] = ET.XMLPullParser(  # nosec
+            events=("start", "end")
+        )
+        path: Final[list[str]] = []
+        elements = 0
+
+        def events() -> Iterator[Any]:
+            for offset in range(0, len(body), _CHUNK_SIZE):
+                parser.feed(body[offset : offset + _CHUNK_SIZE])
+                yield from parser.read_events()
+            parser.close()
+            yield from parser.read_events()
+
+        for event, elem in events():
+            if event == "start":
+                elements += 1
+                path.append(elem.tag)
+                if elements > self.__max_elements:
+                    raise ParseLimitExceeded(
+                        "elements",
+                        f"Document has more than {self.__max_elements} elements",
+                    )
+                if len(path) > self.__max_depth:
+                    raise ParseLimitExceeded(
+                        "depth",
+                        f"Document is nested more than {self.__max_depth} elements deep",
+                    )
+                if path == [elem.tag] and elem.tag != "rss":
+                    raise FeedError(
+                        f"Got XML but with unexpected root element {elem.tag!r}"
+                    )
+                continue
+
+            if len(path) == 3 and path[:2] == ["rss", "channel"]:
+                yield elem
+                elem.clear()
+            path.pop()
+
+
+def parse_date(text: str | None) -> float | None:
+    """
+    Parses an RFC 822 date as found in pubDate and lastBuildDate elements,
+    returning a POSIX timestamp. Returns None if the date can't be parsed,
+    including when it's in a time zone that isn't in the time zone database.
+    """
+    if not text or (parsed := email.utils.parsedate_tz(text)) is None:
+        return None
+
+    if (zone := text.rsplit(None, 1)[-1]) not in _TIME_ZONES:
+        return float(email.utils.mktime_tz(parsed))
+
+    if (tz := _zone(_TIME_ZONES[zone])) is None:
+        return None
+    return datetime.datetime(*parsed[:6], tzinfo=tz).timestamp()
+
+
+@functools.cache
+def _zone(key: str) -> datetime.tzinfo | None:
+    try:
+        return zoneinfo.ZoneInfo(key)
+    except zoneinfo.ZoneInfoNotFoundError:
+        # Guessing the offset would put timestamps hours out, which matters
+        # when they are compared with the current time (as polling does).
+        LOGGER.warning(
+            "Time zone %r not found; install a time zone database (such as the"
+            " tzdata package) so that dates in it can be parsed",
+            key,
+        )
+        return None
@@ -1,11 +1,126 @@
+import atexit
+import copy
 import enum
-from logging import INFO, DEBUG, basicConfig, getLogger
+import json
+from logging import (
+    BASIC_FORMAT,
+    DEBUG,
+    INFO,
+    FileHandler,
+    Filter,
+    Formatter,
+    Handler,
+    LogRecord,
+    StreamHandler,
+    getLogger,
+)
+from logging.handlers import QueueHandler, QueueListener
 import os
-from typing import Final
+import queue
+import threading
+import time
+from typing import Any, Callable, Final, Mapping
+
+import prometheus_client
+
+from . import default_settings
 
 
 LOGGER: Final = getLogger(__name__)
 
+DROPPED: Final = prometheus_client.Counter(
+    "rsyncnet_exporter_log_records_dropped",
+    "Log records that were discarded rather than written",
+    ["reason"],
+)
+
+
+class JsonFormatter(Formatter):
+    """
+    Formats each record as a single line of JSON.
+    """
+
+    def format(self, record: LogRecord) -> str:
+        doc: Final = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            doc["exception"] = self.formatException(record.exc_info)
+        return json.dumps(doc)
+
+
+class RateLimitFilter(Filter):  # pylint: disable=too-few-public-methods
+    """
+    Lets through at most `rate` records per second (with bursts of up to
+    `burst`) for each distinct logger and message template, counting the rest
+    as dropped. Only records at or below max_level are limited.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_level: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.__rate: Final = rate
+        self.__burst: Final = burst
+        self.__max_level: Final = max_level
+        self.__clock: Final = clock
+        self.__lock: Final = threading.Lock()
+        self.__buckets: Final[dict[tuple[str, object], tuple[float, float]]] = {}
+
+    def filter(self, record: LogRecord) -> bool:
+        if record.levelno > self.__max_level:
+            return True
+
+        key: Final = (record.name, record.msg)
+        now: Final = self.__clock()
+        with self.__lock:
+            tokens, last = self.__buckets.get(key, (self.__burst, now))
+            tokens = min(self.__burst, tokens + (now - last) * self.__rate)
+            allowed: Final = tokens >= 1
+            self.__buckets[key] = (tokens - 1 if allowed else tokens, now)
+
+        if not allowed:
+            DROPPED.labels("rate_limited").inc()
+        return allowed
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    def prepare(self, record: LogRecord) -> LogRecord:
+        # Unlike QueueHandler.prepare, this leaves the formatting of the
+        # record (including its exception) to the formatters of the handlers
+        # behind the queue. Only its message is resolved now, in case its
+        # arguments change before the record is written.
+        prepared: Final = copy.copy(record)
+        prepared.msg = prepared.message = record.getMessage()
+        prepared.args = None
+        return prepared
+
+    def enqueue(self, record: LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.labels("queue_full").inc()
+
+
+def queue_handler(handlers: list[Handler], size: int) -> QueueHandler:
+    """
+    Returns a handler that hands records to a bounded queue, from which a
+    background thread passes them on to `handlers`. Logging never blocks on
+    I/O; if the queue is full, the record is dropped instead.
+    """
+    q: Final[queue.Queue[LogRecord]] = queue.Queue(size)
+    listener: Final = QueueListener(q, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return _NonBlockingQueueHandler(q)
+
 
 class Host(enum.Enum):
 
@@ -13,6 +128,7 @@ class Host(enum.Enum):
     FLASK: Final = enum.auto()
     GUNICORN: Final = enum.auto()
     PYTEST: Final = enum.auto()
+    DAEMON: Final = enum.auto()
 
     @classmethod
     def detect(cls) -> "Host":
@@ -22,15 +138,66 @@ class Host(enum.Enum):
             return Host.FLASK
         return Host.UNKNOWN
 
-    def configure_logging(self) -> None:
+    def configure_logging(self, config: Mapping[str, Any] | None = None) -> None:
         level = None
 
         if self == Host.FLASK:
             level = DEBUG if int(os.environ.get("FLASK_DEBUG", "0")) else INFO
         elif self == Host.GUNICORN:
             level = getLogger("gunicorn.error").level
+        elif self == Host.DAEMON:
+            level = INFO
 
         if level is not None:
-            basicConfig(level=level)
+            _configure_queued_logging(self, level, config or {})
 
         LOGGER.debug("Host environment: %s", self.name)
+
+
+def _configure_queued_logging(
+    host: Host, level: int, config: Mapping[str, Any]
+) -> None:
+    def setting(name: str) -> Any:
+        return config.get(name, getattr(default_settings, name))
+
+    json_format: Final = setting("LOG_FORMAT") == "json"
+    size: Final = setting("LOG_QUEUE_SIZE")
+
+    root: Final = getLogger()
+    # Like basicConfig, leave alone a root logger that has already been set up.
+    if not root.handlers:
+        root.setLevel(level)
+        stream: Final = StreamHandler()
+        stream.setFormatter(JsonFormatter() if json_format else Formatter(BASIC_FORMAT))
+        handler: Final = queue_handler([stream], size)
+        if rate := setting("LOG_DEBUG_RATE_LIMIT"):
+            handler.addFilter(
+                RateLimitFilter(rate, setting("LOG_RATE_LIMIT_BURST"), DEBUG)
+            )
+        root.addHandler(handler)
+
+    if host != Host.GUNICORN:
+        return
+
+    # gunicorn writes its own logs (including a line for every request to the
+    # access log) through handlers attached to these loggers. Move them behind
+    # a queue too, so that request threads never wait for the log driver.
+    # FileHandlers are the exception: gunicorn reopens their files when it
+    # receives SIGUSR1 (after the logs have been rotated), but only finds the
+    # ones attached directly to these loggers.
+    for name, rate, max_level in [
+        ("gunicorn.error", setting("LOG_DEBUG_RATE_LIMIT"), DEBUG),
+        ("gunicorn.access", setting("LOG_ACCESS_RATE_LIMIT"), INFO),
+    ]:
+        logger = getLogger(name)
+        if json_format:
+            for h in logger.handlers:
+                h.setFormatter(JsonFormatter())
+        if rate:
+            logger.addFilter(
+                RateLimitFilter(rate, setting("LOG_RATE_LIMIT_BURST"), max_level)
+            )
+        if queued := [h for h in logger.handlers if not isinstance(h, FileHandler)]:
+            for h in queued:
+                logger.removeHandler(h)
+            logger.addHandler(queue_handler(queued, size))
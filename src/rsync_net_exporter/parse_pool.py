@@ -0,0 +1,182 @@
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from logging import getLogger
+import multiprocessing
+import os
+from pathlib import Path
+import threading
+from typing import Any, Final, Iterable, Mapping
+
+import prometheus_client
+
+from . import default_settings, feed
+
+
+LOGGER: Final = getLogger(__name__)
+
+PARSES: Final = prometheus_client.Counter(
+    "rsyncnet_exporter_parses",
+    "Documents parsed, by where they were parsed: in the worker process, in the"
+    " process pool, or in the worker process because the pool's queue was full"
+    " or the pool was broken",
+    ["where"],
+)
+
+POOL_PROCESSES: Final = prometheus_client.Gauge(
+    "rsyncnet_exporter_parse_pool_processes",
+    "Number of processes in each worker's parse pool",
+    multiprocess_mode="livemax",
+)
+
+POOL_MAX_QUEUED: Final = prometheus_client.Gauge(
+    "rsyncnet_exporter_parse_pool_max_queued",
+    "Number of documents that may be waiting for or being parsed by a worker's"
+    " parse pool",
+    multiprocess_mode="livemax",
+)
+
+POOL_THRESHOLD: Final = prometheus_client.Gauge(
+    "rsyncnet_exporter_parse_pool_threshold_bytes",
+    "Documents at least this large are parsed in the pool",
+    multiprocess_mode="livemax",
+)
+
+POOL_QUEUED: Final = prometheus_client.Gauge(
+    "rsyncnet_exporter_parse_pool_queued",
+    "Number of documents waiting for or being parsed by the parse pool",
+    multiprocess_mode="livesum",
+)
+
+
+def _parse(max_elements: int, max_depth: int, body: bytes) -> feed.Feed:
+    return feed.Parser(max_elements, max_depth).parse_uncounted(body)
+
+
+def _remove_metric_files(pids: Iterable[int]) -> None:
+    """
+    Removes the files that prometheus_client's multiprocess mode created for
+    the pool's processes (which inherit PROMETHEUS_MULTIPROC_DIR) once they
+    have exited. Since _parse doesn't record anything, they hold nothing worth
+    aggregating, and would otherwise pile up every time a pool is replaced.
+    """
+    if not (directory := os.environ.get("PROMETHEUS_MULTIPROC_DIR")):
+        return
+    for pid in pids:
+        for path in Path(directory).glob(f"*_{pid}.db"):
+            path.unlink(missing_ok=True)
+
+
+def _pids(pool: ProcessPoolExecutor) -> list[int]:
+    # pylint: disable-next=protected-access
+    return list(pool._processes or {})
+
+
+class PooledParser(feed.Parser):
+    """
+    Parses large documents in a pool of processes, so that a thread parsing
+    one doesn't hold the GIL at the expense of the worker's other threads.
+    Only the decoded accounts are sent back from the pool. Documents smaller
+    than threshold bytes are parsed in-process, since that's cheaper than
+    sending them to another process.
+
+    At most max_queued documents are sent to the pool at once; if more
+    arrive, they are parsed in-process too. The pool is started when it's
+    first needed, so that it belongs to the process that uses it rather than
+    (say) a gunicorn arbiter. If a process in the pool dies, the pool is
+    replaced by a new one, and the document that was being parsed is parsed
+    in-process instead.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        max_elements: int = default_settings.MAX_XML_ELEMENTS,
+        max_depth: int = default_settings.MAX_XML_DEPTH,
+        processes: int = default_settings.PARSE_POOL_PROCESSES,
+        max_queued: int = default_settings.PARSE_POOL_MAX_QUEUED,
+        threshold: int = default_settings.PARSE_POOL_THRESHOLD,
+    ) -> None:
+        super().__init__(max_elements, max_depth)
+        self.__max_elements: Final = max_elements
+        self.__max_depth: Final = max_depth
+        self.__processes: Final = processes
+        self.__threshold: Final = threshold
+        self.__slots: Final = threading.BoundedSemaphore(max_queued)
+        self.__lock: Final = threading.Lock()
+        self.__executor: ProcessPoolExecutor | None = None
+        # So that the pool's metric files are removed when the worker exits.
+        atexit.register(self.shutdown)
+
+        POOL_PROCESSES.set(processes)
+        POOL_MAX_QUEUED.set(max_queued)
+        POOL_THRESHOLD.set(threshold)
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "PooledParser":
+        return cls(
+            config["MAX_XML_ELEMENTS"],
+            config["MAX_XML_DEPTH"],
+            config["PARSE_POOL_PROCESSES"],
+            config["PARSE_POOL_MAX_QUEUED"],
+            config["PARSE_POOL_THRESHOLD"],
+        )
+
+    def parse(self, body: bytes) -> feed.Feed:
+        if len(body) < self.__threshold:
+            PARSES.labels("inline").inc()
+            return super().parse(body)
+
+        # pylint: disable-next=consider-using-with
+        if not self.__slots.acquire(blocking=False):
+            PARSES.labels("overflow").inc()
+            return super().parse(body)
+
+        pool: Final = self.__pool()
+        broken = False
+        try:
+            with POOL_QUEUED.track_inprogress():
+                return pool.submit(
+                    _parse, self.__max_elements, self.__max_depth, body
+                ).result()
+        except BrokenProcessPool:
+            # A process in the pool died (killed by the OOM killer, say), and
+            # the pool can't be used again.
+            LOGGER.warning("Parse pool is broken; starting a new one")
+            broken = True
+            self.__discard(pool)
+        except feed.ParseLimitExceeded as e:
+            feed.ABORTS.labels(e.reason).inc()
+            raise
+        finally:
+            self.__slots.release()
+            PARSES.labels("broken" if broken else "pool").inc()
+
+        return super().parse(body)
+
+    def __pool(self) -> ProcessPoolExecutor:
+        with self.__lock:
+            if self.__executor is None:
+                # Forking a process that may be running other threads isn't
+                # safe, so the pool's processes are started from scratch.
+                self.__executor = ProcessPoolExecutor(
+                    self.__processes, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self.__executor
+
+    def __discard(self, pool: ProcessPoolExecutor) -> None:
+        with self.__lock:
+            # Another thread may have replaced it already.
+            if self.__executor is pool:
+                self.__executor = None
+        # The processes of a broken pool have already been terminated.
+        pids: Final = _pids(pool)
+        pool.shutdown(wait=False, cancel_futures=True)
+        _remove_metric_files(pids)
+
+    def shutdown(self) -> None:
+        with self.__lock:
+            if self.__executor is not None:
+                pids: Final = _pids(self.__executor)
+                self.__executor.shutdown()
+                self.__executor = None
+                _remove_metric_files(pids)
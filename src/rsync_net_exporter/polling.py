@@ -0,0 +1,125 @@
+import threading
+import time
+from typing import Any, Callable, Final, Mapping
+
+import prometheus_client
+
+from . import default_settings, feed, state
+
+
+POLLS: Final = prometheus_client.Counter(
+    "rsyncnet_exporter_polls",
+    "Probes, by whether they fetched the feed from upstream or used a cached copy",
+    ["result"],
+)
+
+# Weight given to the latest interval between builds when updating the
+# estimate of a feed's cadence.
+_SMOOTHING: Final = 0.25
+
+
+def _built(parsed: feed.Feed) -> float | None:
+    """
+    Returns when the usage reported in parsed was measured: the newest pubDate
+    of its accounts' items. The channel's lastBuildDate is only used if none
+    of them have one, since it's stamped whenever the feed is served, and so
+    changes on every fetch.
+    """
+    dates: Final = [
+        date
+        for account in parsed.accounts
+        if (date := feed.parse_date(account.pub_date)) is not None
+    ]
+    return max(dates) if dates else feed.parse_date(parsed.last_build_date)
+
+
+class _Schedule:  # pylint: disable=too-few-public-methods
+    def __init__(self, parsed: feed.Feed) -> None:
+        self.feed = parsed
+        self.last_build: float | None = None
+        self.interval: float | None = None
+        self.next_fetch = 0.0
+
+
+class AdaptivePoller:
+    """
+    Learns how often rsync.net regenerates each target's feed (from the
+    differences between successive build times; see _built), so that
+    upstream is only contacted when a new build is expected. In between, the
+    last feed fetched from the target is served from memory.
+
+    The time until the next fetch is always between min_interval and
+    max_interval seconds. Until the cadence of a feed is known, or once a new
+    build is overdue, it is fetched every min_interval seconds.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = default_settings.POLL_MIN_INTERVAL,
+        max_interval: float = default_settings.POLL_MAX_INTERVAL,
+        clock: Callable[[], float] = time.time,
+        store: state.StateStore | None = None,
+    ) -> None:
+        if min_interval > max_interval:
+            raise ValueError("min_interval must not be greater than max_interval")
+        self.__min_interval: Final = min_interval
+        self.__max_interval: Final = max_interval
+        self.__clock: Final = clock
+        self.__lock: Final = threading.Lock()
+        self.__schedules: Final = state.Namespace[_Schedule](
+            store if store is not None else state.StateStore(), "poll"
+        )
+
+    @classmethod
+    def from_config(
+        cls, config: Mapping[str, Any], store: state.StateStore | None = None
+    ) -> "AdaptivePoller":
+        return cls(
+            config["POLL_MIN_INTERVAL"], config["POLL_MAX_INTERVAL"], store=store
+        )
+
+    def cached(self, target: str) -> feed.Feed | None:
+        """
+        Returns the last feed fetched from target, unless it's time to fetch
+        it again.
+        """
+        with self.__lock:
+            schedule: Final = self.__schedules.get(target)
+            if schedule is None or self.__clock() >= schedule.next_fetch:
+                return None
+        POLLS.labels("cached").inc()
+        return schedule.feed
+
+    def update(self, target: str, parsed: feed.Feed) -> None:
+        """
+        Records a feed that has just been fetched from target.
+        """
+        POLLS.labels("fetched").inc()
+        now: Final = self.__clock()
+        built: Final = _built(parsed)
+
+        with self.__lock:
+            if (schedule := self.__schedules.get(target)) is None:
+                schedule = _Schedule(parsed)
+            schedule.feed = parsed
+
+            if built is not None and schedule.last_build is not None:
+                if built > schedule.last_build:
+                    latest = built - schedule.last_build
+                    schedule.interval = (
+                        latest
+                        if schedule.interval is None
+                        else _SMOOTHING * latest + (1 - _SMOOTHING) * schedule.interval
+                    )
+            if built is not None:
+                schedule.last_build = built
+
+            delay = self.__min_interval
+            if schedule.last_build is not None and schedule.interval is not None:
+                if (expected := schedule.last_build + schedule.interval) > now:
+                    delay = expected - now
+            schedule.next_fetch = now + min(
+                max(delay, self.__min_interval), self.__max_interval
+            )
+            # Stored again each time, since the size of the feed may change.
+            self.__schedules.put(target, schedule)
@@ -0,0 +1,300 @@
+"""
+An opt-in endpoint for profiling a live worker process.
+
+A profiling session is started with a POST to /debug/profile, and covers
+either a number of seconds or a number of probes (whichever ends first). Its
+results are then fetched with a GET, and a DELETE ends it early. Only one session may run at a time in
+each worker process; a GET is answered by whichever worker receives it, so
+when running multiple workers the requests should be repeated until they land
+on the worker that ran the session.
+
+Nothing in this module is registered with the app unless PROFILING_ENABLED is
+set, so it costs nothing when disabled.
+"""
+
+import collections
+import cProfile
+import hmac
+import io
+from logging import getLogger
+import marshal
+import math
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from types import FrameType
+from typing import Final
+
+from flask import Blueprint, Flask, current_app, g, request
+from flask.typing import ResponseReturnValue
+
+
+LOGGER: Final = getLogger(__name__)
+
+profiling: Final = Blueprint(  # pylint: disable=invalid-name
+    "profiling", __name__, url_prefix="/debug/profile"
+)
+
+
+class _Session:  # pylint: disable=too-many-instance-attributes
+    def __init__(self, mode: str, seconds: float, probes: int | None) -> None:
+        self.mode: Final = mode
+        self.deadline: Final = time.monotonic() + seconds
+        self.probes_wanted: Final = probes
+        self.probes_seen = 0
+        self.probes_skipped = 0
+        self.stats: pstats.Stats | None = None
+        self.stacks: Final[collections.Counter[str]] = collections.Counter()
+        self.snapshot: tracemalloc.Snapshot | None = None
+        self.done: Final = threading.Event()
+        self.lock: Final = threading.Lock()
+        self.profiler_lock: Final = threading.Lock()
+        self.__started_tracemalloc = False
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.__started_tracemalloc = True
+
+    def expired(self) -> bool:
+        if time.monotonic() >= self.deadline:
+            return True
+        if self.probes_wanted is not None:
+            return self.probes_seen >= self.probes_wanted
+        return False
+
+    def finish(self) -> None:
+        with self.lock:
+            if self.done.is_set():
+                return
+            self.snapshot = tracemalloc.take_snapshot()
+            if self.__started_tracemalloc:
+                tracemalloc.stop()
+            self.done.set()
+        LOGGER.info(
+            "Profiling session finished after %d probes (%d not profiled)",
+            self.probes_seen,
+            self.probes_skipped,
+        )
+
+
+_SESSION_LOCK: Final = threading.Lock()
+_session: _Session | None = None  # pylint: disable=invalid-name
+
+
+def init_app(app: Flask) -> None:
+    if not app.config["PROFILING_TOKEN"]:
+        raise ValueError("PROFILING_ENABLED requires PROFILING_TOKEN to be set")
+
+    app.register_blueprint(profiling)
+    app.before_request(_before_probe)
+    app.teardown_request(_teardown_probe)
+
+
+@profiling.before_request
+def _check_auth() -> ResponseReturnValue | None:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.encode(), current_app.config["PROFILING_TOKEN"].encode()
+    ):
+        return "Unauthorized", 401, {"WWW-Authenticate": "Bearer"}
+    return None
+
+
+@profiling.post("")
+def start() -> ResponseReturnValue:
+    global _session  # pylint: disable=global-statement
+
+    mode: Final = request.args.get("mode", "deterministic")
+    if mode not in {"deterministic", "sampling"}:
+        return "'mode' must be 'deterministic' or 'sampling'", 400
+
+    max_seconds: Final = current_app.config["PROFILING_MAX_SECONDS"]
+    try:
+        seconds: Final = float(request.args.get("seconds", max_seconds))
+        probes: Final = (
+            int(request.args["probes"]) if "probes" in request.args else None
+        )
+    except ValueError:
+        return "'seconds' and 'probes' must be numbers", 400
+    # min() doesn't cap NaN, which would make the session last forever.
+    if not math.isfinite(seconds) or seconds <= 0:
+        return "'seconds' must be a positive number", 400
+    if probes is not None and probes < 1:
+        return "'probes' must be at least 1", 400
+
+    with _SESSION_LOCK:
+        if _session is not None and not _session.done.is_set():
+            return "A profiling session is already running in this worker", 409
+        session: Final = _Session(mode, min(seconds, max_seconds), probes)
+        _session = session
+
+    # Otherwise a deterministic session would only finish when a probe or
+    # a request for its results arrives after its deadline, leaving
+    # tracemalloc running in an idle worker.
+    timer: Final = threading.Timer(session.deadline - time.monotonic(), session.finish)
+    timer.daemon = True
+    timer.start()
+
+    if mode == "sampling":
+        threading.Thread(
+            target=_sample,
+            args=(session, current_app.config["PROFILING_SAMPLE_INTERVAL"]),
+            name="profiling-sampler",
+            daemon=True,
+        ).start()
+
+    LOGGER.info(
+        "Started %s profiling session for %s seconds or %s probes",
+        mode,
+        min(seconds, max_seconds),
+        probes,
+    )
+    return "Profiling session started\n", 202
+
+
+@profiling.delete("")
+def stop() -> ResponseReturnValue:
+    if (session := _session) is None or session.done.is_set():
+        return "No profiling session running in this worker", 404
+    session.finish()
+    return "Profiling session stopped\n", 200
+
+
+@profiling.get("")
+def results() -> ResponseReturnValue:  # pylint: disable=too-many-return-statements
+    if (session := _finished_session()) is None:
+        return "No finished profiling session in this worker", 404
+
+    fmt: Final = request.args.get(
+        "format", "text" if session.mode == "deterministic" else "collapsed"
+    )
+
+    if session.mode == "deterministic" and fmt in {"text", "pstats"}:
+        if session.stats is None:
+            return "No probes were profiled", 404
+        if fmt == "pstats":
+            # The same format as pstats.Stats.dump_stats, loadable with
+            # pstats.Stats, snakeviz, gprof2dot, etc.
+            return (
+                marshal.dumps(session.stats.stats),  # type: ignore [attr-defined]
+                200,
+                {"Content-Type": "application/octet-stream"},
+            )
+        out: Final = io.StringIO()
+        session.stats.stream = out  # type: ignore [attr-defined]
+        try:
+            session.stats.sort_stats(request.args.get("sort", "cumulative"))
+        except KeyError:
+            return "Unknown 'sort' key", 400
+        session.stats.print_stats(request.args.get("limit", 50, type=int))
+        return out.getvalue(), 200, {"Content-Type": "text/plain"}
+
+    if session.mode == "sampling" and fmt == "collapsed":
+        # The input format of flamegraph.pl, speedscope, inferno, etc.
+        return (
+            "".join(f"{stack} {count}\n" for stack, count in session.stacks.items()),
+            200,
+            {"Content-Type": "text/plain"},
+        )
+
+    return f"Format {fmt!r} not available for {session.mode} sessions", 400
+
+
+@profiling.get("/tracemalloc")
+def allocations() -> ResponseReturnValue:
+    if (session := _finished_session()) is None or session.snapshot is None:
+        return "No finished profiling session in this worker", 404
+
+    try:
+        stats: Final = session.snapshot.statistics(request.args.get("key", "lineno"))
+    except ValueError:
+        return "Unknown 'key'", 400
+    limit: Final = request.args.get("limit", 50, type=int)
+    return (
+        "".join(f"{stat}\n" for stat in stats[:limit]),
+        200,
+        {"Content-Type": "text/plain"},
+    )
+
+
+def _finished_session() -> _Session | None:
+    if (session := _session) is None:
+        return None
+    if not session.done.is_set():
+        if not session.expired():
+            return None
+        session.finish()
+    return session
+
+
+def _before_probe() -> None:
+    if request.endpoint != "exporter.probe":
+        return
+    if (session := _session) is None or session.done.is_set():
+        return
+
+    g.profiling_session = session
+    if session.mode != "deterministic":
+        return
+
+    # Only one profiler can be active at a time, so concurrent probes are
+    # counted but not profiled.
+    if not session.profiler_lock.acquire(  # pylint: disable=consider-using-with
+        blocking=False
+    ):
+        with session.lock:
+            session.probes_skipped += 1
+        return
+    profiler: Final = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiling tool (e.g., coverage) is active.
+        session.profiler_lock.release()
+        with session.lock:
+            session.probes_skipped += 1
+        return
+    g.profiler = profiler
+
+
+def _teardown_probe(_exc: BaseException | None) -> None:
+    if (session := g.pop("profiling_session", None)) is None:
+        return
+
+    if (profiler := g.pop("profiler", None)) is not None:
+        profiler.disable()
+        session.profiler_lock.release()
+        with session.lock:
+            if session.stats is None:
+                session.stats = pstats.Stats(profiler)
+            else:
+                session.stats.add(profiler)
+
+    with session.lock:
+        session.probes_seen += 1
+    if session.expired():
+        session.finish()
+
+
+def _sample(session: _Session, interval: float) -> None:
+    me: Final = threading.get_ident()
+    while not session.done.is_set() and not session.expired():
+        for (
+            ident,
+            frame,
+        ) in sys._current_frames().items():  # pylint: disable=protected-access
+            if ident != me:
+                session.stacks[_collapse(frame)] += 1
+        time.sleep(interval)
+    session.finish()
+
+
+def _collapse(frame: FrameType | None) -> str:
+    names: Final[list[str]] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
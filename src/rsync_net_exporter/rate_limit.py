@@ -0,0 +1,126 @@
+from collections import OrderedDict, deque
+import threading
+import time
+from typing import Any, Callable, Final, Mapping
+from urllib.parse import urlsplit
+
+import prometheus_client
+
+from . import default_settings
+
+
+WAIT: Final = prometheus_client.Histogram(
+    "rsyncnet_exporter_upstream_rate_limit_wait_seconds",
+    "Time spent waiting for the rate limiter before fetching from upstream",
+)
+
+THROTTLED: Final = prometheus_client.Counter(
+    "rsyncnet_exporter_upstream_throttled",
+    "Fetches that were delayed by the rate limiter, or that gave up waiting",
+    ["result"],
+)
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class _Host:  # pylint: disable=too-few-public-methods
+    def __init__(self, tokens: float, now: float) -> None:
+        self.tokens = tokens
+        self.updated = now
+        # The tickets of the fetches waiting for each target, in the order in
+        # which the targets will next be served.
+        self.waiting: Final[OrderedDict[str, deque[object]]] = OrderedDict()
+
+
+class HostRateLimiter:
+    """
+    Limits fetches to each host to `rate` per second, with bursts of up to
+    `burst`, using a token bucket. When fetches have to wait, targets take
+    turns in round-robin order, so that a target with many waiting fetches
+    can't starve the others. A fetch that would wait longer than max_wait
+    seconds fails with RateLimitExceeded.
+    """
+
+    def __init__(
+        self,
+        rate: float = default_settings.RATE_LIMIT_RATE,
+        burst: float = default_settings.RATE_LIMIT_BURST,
+        max_wait: float = default_settings.RATE_LIMIT_MAX_WAIT,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.__rate: Final = rate
+        self.__burst: Final = burst
+        self.__max_wait: Final = max_wait
+        self.__clock: Final = clock
+        self.__cond: Final = threading.Condition()
+        self.__hosts: Final[dict[str, _Host]] = {}
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "HostRateLimiter":
+        return cls(
+            config["RATE_LIMIT_RATE"],
+            config["RATE_LIMIT_BURST"],
+            config["RATE_LIMIT_MAX_WAIT"],
+        )
+
+    def acquire(self, url: str) -> None:
+        """
+        Blocks until url may be fetched.
+        """
+        start: Final = self.__clock()
+        ticket: Final = object()
+        throttled = False
+
+        with self.__cond:
+            hostname: Final = urlsplit(url).hostname or ""
+            if (host := self.__hosts.get(hostname)) is None:
+                host = self.__hosts[hostname] = _Host(self.__burst, start)
+            host.waiting.setdefault(url, deque()).append(ticket)
+
+            try:
+                while not self.__take(host, url, ticket):
+                    throttled = True
+                    if (remaining := start + self.__max_wait - self.__clock()) <= 0:
+                        THROTTLED.labels("rejected").inc()
+                        raise RateLimitExceeded(
+                            f"Waited more than {self.__max_wait} seconds to fetch {url!r}"
+                        )
+                    if host.tokens < 1:
+                        remaining = min(remaining, (1 - host.tokens) / self.__rate)
+                    self.__cond.wait(remaining)
+            except BaseException:
+                queue: Final = host.waiting[url]
+                queue.remove(ticket)
+                if not queue:
+                    del host.waiting[url]
+                self.__cond.notify_all()
+                raise
+
+        WAIT.observe(self.__clock() - start)
+        if throttled:
+            THROTTLED.labels("delayed").inc()
+
+    def __take(self, host: _Host, url: str, ticket: object) -> bool:
+        now: Final = self.__clock()
+        host.tokens = min(
+            self.__burst, host.tokens + (now - host.updated) * self.__rate
+        )
+        host.updated = now
+
+        if host.tokens < 1 or next(iter(host.waiting)) != url:
+            return False
+        queue: Final = host.waiting[url]
+        if queue[0] is not ticket:
+            return False
+
+        host.tokens -= 1
+        queue.popleft()
+        if queue:
+            host.waiting.move_to_end(url)
+        else:
+            del host.waiting[url]
+        # Let the next waiter check whether it's their turn.
+        self.__cond.notify_all()
+        return True
@@ -0,0 +1,143 @@
+"""
+Serves a corpus recorded with RECORD_DIRECTORY over HTTP, so that benchmarks
+can be run offline against realistic responses.
+
+    python -m rsync_net_exporter.replay --speed=10 CORPUS_DIR
+
+Each path in the corpus is answered with the responses recorded for it in
+turn, taking as long as they took to arrive from upstream divided by --speed
+(or without any delay if it is 0). Point the exporter at it by setting
+FLASK_RSYNC_NET_HOST=127.0.0.1.
+"""
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from pathlib import Path
+import sys
+import threading
+import time
+from typing import Any, Callable, Final, Iterable, Sequence
+
+from . import corpus, log_config
+
+
+LOGGER: Final = getLogger(__name__)
+
+_CHUNK_SIZE: Final = 64 * 1024
+
+
+class Replayer:
+    def __init__(
+        self,
+        entries: Iterable[corpus.Entry],
+        speed: float,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.__speed: Final = speed
+        self.__sleep: Final = sleep
+        self.__lock: Final = threading.Lock()
+        self.__entries: Final[dict[str, list[corpus.Entry]]] = {}
+        self.__next: Final[dict[str, int]] = {}
+        for entry in entries:
+            self.__entries.setdefault(entry.path, []).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.__entries.values())
+
+    def next(self, path: str) -> corpus.Entry | None:
+        """
+        Returns the next response to serve for path, starting again from the
+        first once they have all been served.
+        """
+        if (entries := self.__entries.get(path)) is None:
+            return None
+        with self.__lock:
+            i: Final = self.__next.get(path, 0)
+            self.__next[path] = (i + 1) % len(entries)
+        return entries[i]
+
+    def delay(self, recorded: float) -> None:
+        if self.__speed > 0 and recorded > 0:
+            self.__sleep(recorded / self.__speed)
+
+
+def make_server(replayer: Replayer, address: tuple[str, int]) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # pylint: disable=invalid-name
+            entry: Final = replayer.next(self.path.partition("?")[0])
+            if entry is None:
+                self.send_error(404)
+                return
+
+            replayer.delay(entry.elapsed)
+            self.send_response(entry.status)
+            for name, value in entry.headers.items():
+                self.send_header(name, value)
+            body: Final = entry.body.encode()
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+
+            # Spread the rest of the recorded time over the body.
+            chunks: Final = [
+                body[offset : offset + _CHUNK_SIZE]
+                for offset in range(0, len(body), _CHUNK_SIZE)
+            ]
+            for chunk in chunks:
+                replayer.delay((entry.duration - entry.elapsed) / len(chunks))
+                self.wfile.write(chunk)
+
+        # pylint: disable-next=redefined-builtin
+        def log_message(self, format: str, *args: Any) -> None:
+            LOGGER.debug(format, *args)
+
+    return ThreadingHTTPServer(address, Handler)
+
+
+def main(argv: Sequence[str]) -> int:
+    parser: Final = argparse.ArgumentParser(
+        prog="python -m rsync_net_exporter.replay",
+        description=(__doc__ or "").strip().split("\n\n", maxsplit=1)[0],
+    )
+    parser.add_argument("corpus", type=Path, help="directory containing the corpus")
+    parser.add_argument(
+        "--bind",
+        default="127.0.0.1",
+        help="address to listen on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=9771,
+        help="port to listen on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1,
+        help="divide recorded timings by this; 0 to serve responses without delay (default: %(default)s)",
+    )
+    args: Final = parser.parse_args(argv)
+
+    log_config.Host.DAEMON.configure_logging()
+
+    replayer: Final = Replayer(corpus.load(args.corpus), args.speed)
+    if not replayer:
+        parser.error(f"no responses found in {str(args.corpus)!r}")
+
+    with make_server(replayer, (args.bind, args.port)) as server:
+        LOGGER.info(
+            "Serving %d responses on http://%s:%d/",
+            len(replayer),
+            *server.server_address[:2],
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
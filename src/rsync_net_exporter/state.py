@@ -0,0 +1,174 @@
+from collections import OrderedDict, deque
+import sys
+import threading
+import time
+from typing import Any, Callable, Final, Generic, Hashable, Mapping, TypeVar
+
+import prometheus_client
+
+from . import default_settings
+
+
+ENTRIES: Final = prometheus_client.Gauge(
+    "rsyncnet_exporter_state_entries",
+    "Number of entries in the per-target state store",
+    multiprocess_mode="livesum",
+)
+
+BYTES: Final = prometheus_client.Gauge(
+    "rsyncnet_exporter_state_bytes",
+    "Approximate size of the entries in the per-target state store",
+    multiprocess_mode="livesum",
+)
+
+EVICTIONS: Final = prometheus_client.Counter(
+    "rsyncnet_exporter_state_evictions",
+    "Entries evicted from the per-target state store, by the limit that caused it",
+    ["reason"],
+)
+
+T = TypeVar("T")
+
+
+def approximate_size(obj: object) -> int:
+    """
+    Returns the approximate number of bytes used by obj and the objects it
+    refers to through containers and instance attributes.
+    """
+    seen: Final[set[int]] = set()
+    stack: Final = [obj]
+    total = 0
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset, deque)):
+            stack.extend(o)
+        elif hasattr(o, "__dict__") and not isinstance(o, type):
+            stack.append(vars(o))
+    return total
+
+
+class _Entry:  # pylint: disable=too-few-public-methods
+    def __init__(self, value: object, size: int, used: float) -> None:
+        self.value: Final = value
+        self.size: Final = size
+        self.used = used
+
+
+class StateStore:
+    """
+    Holds the state that the exporter keeps about each target (or account),
+    so that the memory it uses is bounded no matter how many distinct targets
+    are probed. Entries are evicted in least-recently-used order once there
+    are more than max_entries of them or their approximate total size exceeds
+    max_bytes, and once they have gone unused for ttl seconds.
+
+    Each kind of state is kept in its own Namespace.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = default_settings.STATE_MAX_ENTRIES,
+        max_bytes: int = default_settings.STATE_MAX_BYTES,
+        ttl: float = default_settings.STATE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.__max_entries: Final = max_entries
+        self.__max_bytes: Final = max_bytes
+        self.__ttl: Final = ttl
+        self.__clock: Final = clock
+        self.__lock: Final = threading.Lock()
+        self.__entries: Final[OrderedDict[Hashable, _Entry]] = OrderedDict()
+        self.__bytes = 0
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "StateStore":
+        return cls(
+            config["STATE_MAX_ENTRIES"], config["STATE_MAX_BYTES"], config["STATE_TTL"]
+        )
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    @property
+    def bytes(self) -> int:
+        return self.__bytes
+
+    def get(self, key: Hashable) -> object | None:
+        now: Final = self.__clock()
+        with self.__lock:
+            self.__expire(now)
+            if (entry := self.__entries.get(key)) is None:
+                return None
+            entry.used = now
+            self.__entries.move_to_end(key)
+            return entry.value
+
+    def put(self, key: Hashable, value: object, size: int | None = None) -> None:
+        """
+        Stores value under key, replacing any previous value. If size isn't
+        given, it's estimated with approximate_size.
+        """
+        if size is None:
+            size = approximate_size(value)
+        now: Final = self.__clock()
+        with self.__lock:
+            self.__remove(key)
+            if size > self.__max_bytes:
+                EVICTIONS.labels("bytes").inc()
+            else:
+                self.__entries[key] = _Entry(value, size, now)
+                self.__bytes += size
+                self.__expire(now)
+                while len(self.__entries) > self.__max_entries:
+                    self.__evict("entries")
+                while self.__bytes > self.__max_bytes:
+                    self.__evict("bytes")
+            self.__update_metrics()
+
+    def __expire(self, now: float) -> None:
+        # Entries are ordered by when they were last used, so the expired
+        # ones are all at the front.
+        expired = False
+        while self.__entries:
+            if now - next(iter(self.__entries.values())).used < self.__ttl:
+                break
+            self.__evict("ttl")
+            expired = True
+        if expired:
+            self.__update_metrics()
+
+    def __evict(self, reason: str) -> None:
+        _, entry = self.__entries.popitem(last=False)
+        self.__bytes -= entry.size
+        EVICTIONS.labels(reason).inc()
+
+    def __remove(self, key: Hashable) -> None:
+        if (entry := self.__entries.pop(key, None)) is not None:
+            self.__bytes -= entry.size
+
+    def __update_metrics(self) -> None:
+        ENTRIES.set(len(self.__entries))
+        BYTES.set(self.__bytes)
+
+
+class Namespace(Generic[T]):
+    """
+    A view of the entries of a StateStore that hold one kind of state.
+    """
+
+    def __init__(self, store: StateStore, name: str) -> None:
+        self.__store: Final = store
+        self.__name: Final = name
+
+    def get(self, key: Hashable) -> T | None:
+        return self.__store.get((self.__name, key))  # type: ignore [return-value]
+
+    def put(self, key: Hashable, value: T, size: int | None = None) -> None:
+        self.__store.put((self.__name, key), value, size)
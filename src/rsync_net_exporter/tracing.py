@@ -0,0 +1,285 @@
+"""
+Optional tracing of the probe pipeline, modelled on OpenTelemetry.
+
+Each probe produces a trace made up of spans for each stage of the probe.
+Incoming W3C Trace Context (traceparent) headers are honoured, so that a probe
+can be attributed to the trace of whatever made the request. Finished spans
+are held until the span at the root of their trace in this process finishes,
+and are then handed to a pluggable exporter all at once.
+
+Nothing in this module is registered with the app unless TRACING_ENABLED is
+set; outside of such an app's context, span() returns a shared no-op context
+manager.
+"""
+
+import atexit
+import contextlib
+import contextvars
+import dataclasses
+import json
+from logging import getLogger
+import queue
+import re
+import secrets
+import sys
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Final,
+    Iterable,
+    Iterator,
+    Mapping,
+    Protocol,
+    TextIO,
+)
+
+from flask import Flask, current_app, g, has_app_context, request
+import prometheus_client
+from werkzeug.utils import import_string
+
+
+LOGGER: Final = getLogger(__name__)
+
+DROPPED: Final = prometheus_client.Counter(
+    "rsyncnet_exporter_spans_dropped",
+    "Spans that were discarded because the file exporter's queue was full",
+)
+
+# Number of traces that may be waiting to be written by a FileSpanExporter.
+_QUEUE_SIZE: Final = 1000
+
+
+@dataclasses.dataclass
+class Span:  # pylint: disable=too-many-instance-attributes
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start_time_ns: int
+    end_time_ns: int | None = None
+    attributes: dict[str, Any] = dataclasses.field(default_factory=dict)
+    status: str = "ok"
+    error: str | None = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+class SpanExporter(Protocol):  # pylint: disable=too-few-public-methods
+    def export(self, spans: Iterable[Span]) -> None: ...
+
+
+class InMemorySpanExporter:
+    """
+    Keeps finished spans in a list. Intended for tests.
+    """
+
+    def __init__(self) -> None:
+        self.spans: Final[list[Span]] = []
+        self.__lock: Final = threading.Lock()
+
+    def export(self, spans: Iterable[Span]) -> None:
+        with self.__lock:
+            self.spans.extend(spans)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.spans.clear()
+
+
+class FileSpanExporter:
+    """
+    Writes finished spans to a file (or standard error if path is "-"), one
+    JSON object per line. Like log records, they are written by a background
+    thread from a bounded queue, so that exporting never blocks; if the queue
+    is full, the spans are dropped instead.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.__file: TextIO = sys.stderr
+        if path != "-":
+            # pylint: disable-next=consider-using-with
+            self.__file = open(path, "a", encoding="utf-8")
+        self.__queue: Final[queue.Queue[tuple[str, int] | None]] = queue.Queue(
+            _QUEUE_SIZE
+        )
+        self.__thread: Final = threading.Thread(
+            target=self.__write, name="span-writer", daemon=True
+        )
+        self.__thread.start()
+        atexit.register(self.close)
+
+    def export(self, spans: Iterable[Span]) -> None:
+        docs: Final = [json.dumps(dataclasses.asdict(span)) for span in spans]
+        try:
+            self.__queue.put_nowait(("".join(doc + "\n" for doc in docs), len(docs)))
+        except queue.Full:
+            DROPPED.inc(len(docs))
+
+    def close(self) -> None:
+        """
+        Writes any spans that are still queued, and stops the writer thread.
+        """
+        if self.__thread.is_alive():
+            self.__queue.put(None)
+            self.__thread.join()
+
+    def __write(self) -> None:
+        while (item := self.__queue.get()) is not None:
+            lines, count = item
+            try:
+                self.__file.write(lines)
+                self.__file.flush()
+            except OSError:
+                DROPPED.inc(count)
+
+
+_TRACEPARENT_RE: Final = re.compile(
+    r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$"
+)
+
+_current: Final[contextvars.ContextVar[Span | None]] = contextvars.ContextVar(
+    "rsync_net_exporter.tracing.span", default=None
+)
+
+# The finished spans of the current trace, waiting for its root span to end.
+_finished: Final[contextvars.ContextVar[list[Span] | None]] = contextvars.ContextVar(
+    "rsync_net_exporter.tracing.finished", default=None
+)
+
+_NULL_SPAN: Final[ContextManager[Span | None]] = contextlib.nullcontext()
+
+_EXTENSION: Final = "rsync_net_exporter.tracing"
+
+
+def init_app(app: Flask) -> None:
+    app.extensions[_EXTENSION] = _make_exporter(app.config)
+    app.before_request(_before_probe)
+    app.teardown_request(_teardown_probe)
+
+
+def _make_exporter(config: Mapping[str, Any]) -> SpanExporter:
+    name: Final = config["TRACING_EXPORTER"]
+    if name == "file":
+        return FileSpanExporter(config["TRACING_FILE"])
+    if name == "memory":
+        return InMemorySpanExporter()
+    factory: Final[Callable[[Mapping[str, Any]], SpanExporter]] = import_string(name)
+    return factory(config)
+
+
+def _exporter() -> SpanExporter | None:
+    if not has_app_context():
+        return None
+    exporter: Final[SpanExporter | None] = current_app.extensions.get(_EXTENSION)
+    return exporter
+
+
+def span(name: str, **attributes: Any) -> ContextManager[Span | None]:
+    """
+    Returns a context manager that records a span covering its body, as a
+    child of the current span.
+    """
+    if (exporter := _exporter()) is None:
+        return _NULL_SPAN
+    return _span(exporter, name, attributes, _current.get())
+
+
+@contextlib.contextmanager
+def _span(
+    exporter: SpanExporter,
+    name: str,
+    attributes: dict[str, Any],
+    parent: Span | None,
+    remote_parent: tuple[str, str] | None = None,
+) -> Iterator[Span]:
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    elif remote_parent is not None:
+        trace_id, parent_id = remote_parent
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+
+    s: Final = Span(
+        name=name,
+        trace_id=trace_id,
+        span_id=secrets.token_hex(8),
+        parent_id=parent_id,
+        start_time_ns=time.time_ns(),
+        attributes=attributes,
+    )
+    # Spans are exported along with the rest of their trace once its root
+    # span ends, rather than one at a time (for instance, for every account
+    # decoded).
+    parent_batch: Final = _finished.get() if parent is not None else None
+    batch: Final[list[Span]] = parent_batch if parent_batch is not None else []
+    batch_token: Final = _finished.set(batch) if parent_batch is None else None
+    token: Final = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status = "error"
+        s.error = repr(e)
+        raise
+    finally:
+        _current.reset(token)
+        s.end_time_ns = time.time_ns()
+        batch.append(s)
+        if batch_token is not None:
+            _finished.reset(batch_token)
+            try:
+                exporter.export(batch)
+            except Exception:  # pylint: disable=broad-exception-caught
+                LOGGER.exception("Failed to export trace of span %r", s.name)
+
+
+def _parse_traceparent(header: str | None) -> tuple[str, str] | None:
+    if header is None or not (m := _TRACEPARENT_RE.match(header.strip().lower())):
+        return None
+    trace_id, parent_id = m.groups()
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id
+
+
+def _before_probe() -> None:
+    if request.endpoint != "exporter.probe" or (exporter := _exporter()) is None:
+        return
+
+    cm: Final = _span(
+        exporter,
+        "probe",
+        {"http.method": request.method},
+        None,
+        _parse_traceparent(request.headers.get("traceparent")),
+    )
+    cm.__enter__()  # pylint: disable=unnecessary-dunder-call
+    g.tracing_span = cm
+
+
+def _teardown_probe(exc: BaseException | None) -> None:
+    if (cm := g.pop("tracing_span", None)) is None:
+        return
+    if exc is None:
+        cm.__exit__(None, None, None)
+    else:
+        cm.__exit__(type(exc), exc, exc.__traceback__)
+
+
+def wrap_wsgi(name: str, app: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Records a span covering each call of a WSGI application (for views that
+    return one, whose work would otherwise happen after the view returns).
+    """
+    if _exporter() is None:
+        return app
+
+    def traced(environ: Any, start_response: Any) -> Any:
+        with span(name):
+            return app(environ, start_response)
+
+    return traced
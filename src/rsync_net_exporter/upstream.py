@@ -0,0 +1,186 @@
+import socket
+import time
+from typing import Any, Final, Mapping, NamedTuple
+
+import prometheus_client
+import requests
+import requests.adapters
+from urllib3 import connectionpool
+
+from . import default_settings, dns_cache, rate_limit, tracing
+
+
+ABORTS: Final = prometheus_client.Counter(
+    "rsyncnet_exporter_upstream_aborts",
+    "Responses whose download was abandoned because they exceeded a limit",
+    ["reason"],
+)
+
+RESPONSE_BYTES: Final = prometheus_client.Histogram(
+    "rsyncnet_exporter_upstream_response_bytes",
+    "Size of response bodies read from upstream (including those abandoned)",
+    buckets=[2**n for n in range(10, 25, 2)],
+)
+
+_CHUNK_SIZE: Final = 64 * 1024
+
+
+class ResponseTooLarge(Exception):
+    pass
+
+
+class Response(NamedTuple):
+    """
+    A response from upstream. elapsed is the time until its headers were
+    received, and duration the time until its body had been read.
+    """
+
+    status: int
+    headers: Mapping[str, str]
+    elapsed: float
+    duration: float
+    body: bytes
+
+
+class Upstream:
+    """
+    Fetches documents from rsync.net. A single instance is shared by all
+    probes handled by an app, so that connections (and any other state that
+    benefits from being long-lived) can be reused between probes.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session | None = None,
+        max_response_bytes: int = default_settings.MAX_RESPONSE_BYTES,
+        limiter: rate_limit.HostRateLimiter | None = None,
+    ) -> None:
+        self.__session: Final = session or requests.Session()
+        self.__max_response_bytes: Final = max_response_bytes
+        self.__limiter: Final = limiter
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "Upstream":
+        cache: Final = (
+            dns_cache.DnsCache.from_config(config)
+            if config["DNS_CACHE_ENABLED"]
+            else None
+        )
+
+        session: Final = requests.Session()
+        adapter: Final = UpstreamAdapter(cache)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        limiter: Final = (
+            rate_limit.HostRateLimiter.from_config(config)
+            if config["RATE_LIMIT_ENABLED"]
+            else None
+        )
+
+        return cls(session, config["MAX_RESPONSE_BYTES"], limiter)
+
+    def fetch(self, url: str) -> bytes:
+        """
+        Returns the (decoded) body of the response, reading no more than
+        max_response_bytes of it.
+        """
+        return self.fetch_response(url).body
+
+    def fetch_response(self, url: str) -> Response:
+        """
+        Like fetch, but returns the response's status, headers and timing
+        along with its body.
+        """
+        if self.__limiter is not None:
+            with tracing.span("rate_limit"):
+                self.__limiter.acquire(url)
+
+        start: Final = time.monotonic()
+        with self.__session.get(url, timeout=5, stream=True) as resp:
+            resp.raise_for_status()
+
+            content_length: Final = resp.headers.get("Content-Length", "")
+            if (
+                content_length.isdigit()
+                and int(content_length) > self.__max_response_bytes
+                and not resp.headers.get("Content-Encoding")
+            ):
+                RESPONSE_BYTES.observe(0)
+                raise self.__too_large(url)
+
+            body: Final = bytearray()
+            for chunk in resp.iter_content(_CHUNK_SIZE):
+                body.extend(chunk)
+                if len(body) > self.__max_response_bytes:
+                    RESPONSE_BYTES.observe(len(body))
+                    raise self.__too_large(url)
+
+        RESPONSE_BYTES.observe(len(body))
+        return Response(
+            resp.status_code,
+            resp.headers,
+            resp.elapsed.total_seconds(),
+            time.monotonic() - start,
+            bytes(body),
+        )
+
+    def __too_large(self, url: str) -> ResponseTooLarge:
+        ABORTS.labels("size").inc()
+        return ResponseTooLarge(
+            f"Response from {url!r} is larger than {self.__max_response_bytes} bytes"
+        )
+
+
+class UpstreamAdapter(requests.adapters.HTTPAdapter):
+    """
+    A transport adapter that records a span for each new connection, and
+    optionally resolves host names through a DnsCache. The original host name
+    is still used for the Host header, SNI and certificate verification.
+    """
+
+    def __init__(self, cache: dns_cache.DnsCache | None = None, **kwargs: Any) -> None:
+        self.__cache: Final = cache
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _pool_class(connectionpool.HTTPConnectionPool, self.__cache),
+            "https": _pool_class(connectionpool.HTTPSConnectionPool, self.__cache),
+        }
+
+
+def _pool_class(
+    base: type[connectionpool.HTTPConnectionPool], cache: dns_cache.DnsCache | None
+) -> type[connectionpool.HTTPConnectionPool]:
+    conn_base: Final = base.ConnectionCls
+
+    # pylint: disable-next=too-few-public-methods
+    class Connection(conn_base):  # type: ignore [valid-type,misc]
+        def connect(self) -> None:
+            with tracing.span("connect", host=self.host, port=self.port):
+                super().connect()
+
+        def _new_conn(self) -> socket.socket:
+            if cache is None:
+                return super()._new_conn()  # type: ignore [no-any-return]
+
+            # urllib3 opens the socket to _dns_host, but uses host for
+            # everything else.
+            #
+            # pylint: disable=access-member-before-definition,attribute-defined-outside-init
+            dns_host: Final[str] = self._dns_host  # type: ignore [has-type]
+            error: OSError | None = None
+            for address in cache.resolve(self.host, self.port):
+                self._dns_host = address
+                try:
+                    return super()._new_conn()  # type: ignore [no-any-return]
+                except OSError as e:
+                    error = e
+                finally:
+                    self._dns_host = dns_host
+            assert error is not None  # nosec
+            raise error
+
+    return type(f"Upstream{base.__name__}", (base,), {"ConnectionCls": Connection})
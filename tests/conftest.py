@@ -0,0 +1,133 @@
+import prometheus_client
+import pytest
+
+from rsync_net_exporter import create_app, log_config
+
+
+SAMPLE_XML = """\
+<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0">
+ <channel>
+   <title>Rsync.net Usage Report RSS Feed - Sun, 14 Apr 2024 09:18:46 PT</title>
+   <link>https://www.rsync.net/am/rss.xml</link>
+   <lastBuildDate>Sun, 14 Apr 2024 09:18:46 PT</lastBuildDate>
+   <description>This is a usage report detailing how much disk space you are using and your quota.</description>
+   <language>en</language>
+
+   <item>
+     <title>Current Total Standard Usage</title>
+     <link>https://www.rsync.net/am/dashboard.html</link>
+     <pubDate>Sun, 14 Apr 2024 09:01:01 PT</pubDate>
+     <description><![CDATA[120.15 GB]]></description>
+     <guid>https://rsync.net</guid>
+   </item>
+
+   <item>
+     <title>tr3289</title>
+     <link>https://www.rsync.net/am/dashboard.html</link>
+     <pubDate>Sun, 14 Apr 2024 09:01:01 PT</pubDate>
+     <description><![CDATA["120.15 GB<br>120.00 GB Quota"]]></description>
+     <guid>https://rsync.net</guid>
+     <uid>tr3289</uid>
+     <nickname>myspace</nickname>
+     <gr></gr>
+     <location>CH</location>
+     <quota_gb>120</quota_gb>
+     <billed_gb>120.15</billed_gb>
+     <dataset_gb>120.15</dataset_gb>
+     <dataset_bytes>119011805184</dataset_bytes>
+     <inodes>5681</inodes>
+     <free_snaps_conf>0</free_snaps_conf>
+     <custom_snaps_conf></custom_snaps_conf>
+     <snap_used_free_gb>12.1</snap_used_free_gb>
+     <snap_used_cust_gb>14.7</snap_used_cust_gb>
+     <idlewarn_days>7</idlewarn_days>
+     <idlewarn_freq>24</idlewarn_freq>
+     <idlewarn_min_bytes>1024</idlewarn_min_bytes>
+     <usage_idle_days>2</usage_idle_days>
+     <ssh_ro></ssh_ro>
+     <pass_ro>1</pass_ro>
+     <fs_ro></fs_ro>
+   </item>
+
+ </channel>
+</rss>
+"""
+
+
+@pytest.fixture
+def sample_xml():
+    """
+    An RSS feed containing a single storage account.
+    """
+    return SAMPLE_XML
+
+
+@pytest.fixture
+def flask_metrics_registry(monkeypatch):
+    """
+    Gives each app created by create_app its own registry for the metrics
+    created by PrometheusMetrics, so that create_app can be called more than
+    once.
+    """
+    registry = prometheus_client.CollectorRegistry()
+    monkeypatch.setattr("prometheus_client.REGISTRY", registry)
+    return registry
+
+
+@pytest.fixture
+def make_app(monkeypatch, flask_metrics_registry):
+    """
+    Returns a function that creates an app for testing, with RSYNC_NET_HOST
+    set to rsync.example.net and any other settings given as keyword
+    arguments (set through FLASK_ environment variables).
+    """
+
+    def make_app(**settings):
+        monkeypatch.setenv("FLASK_RSYNC_NET_HOST", "rsync.example.net")
+        for name, value in settings.items():
+            monkeypatch.setenv(f"FLASK_{name}", value)
+        app = create_app(host=log_config.Host.PYTEST)
+        app.config.update({"TESTING": True})
+        return app
+
+    return make_app
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """
+    A clock that stands still until its `now` attribute is changed.
+    """
+    return FakeClock()
+
+
+class FakeResolver:
+    def __init__(self, answer):
+        self.answer = answer
+        self.ttl = None
+        self.calls = 0
+
+    def __call__(self, host, port):
+        self.calls += 1
+        if isinstance(self.answer, Exception):
+            raise self.answer
+        return self.answer, self.ttl
+
+
+@pytest.fixture
+def resolver():
+    """
+    A resolver for dns_cache.DnsCache that answers every lookup with its
+    `answer` attribute (or raises it, if it's an exception) and counts its
+    calls.
+    """
+    return FakeResolver(["192.0.2.1"])
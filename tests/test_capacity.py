@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from rsync_net_exporter import capacity
+
+
+def test_slope_of_line():
+    # given:
+    estimator = capacity.GrowthEstimator(8)
+
+    # when:
+    for t in range(5):
+        estimator.add(1.7e9 + t * 3600, 1e11 + t * 3600 * 1000)
+
+    # then:
+    assert estimator.slope() == pytest.approx(1000)
+
+
+def test_slope_needs_two_observations():
+    # given:
+    estimator = capacity.GrowthEstimator(8)
+
+    # when:
+    estimator.add(1.7e9, 1e11)
+
+    # then:
+    assert estimator.slope() is None
+
+
+def test_old_observations_evicted():
+    # given:
+    estimator = capacity.GrowthEstimator(4)
+    for t in range(4):
+        estimator.add(t, 0)
+
+    # when:
+    for t in range(4, 8):
+        estimator.add(t, (t - 4) * 10)
+
+    # then:
+    assert len(estimator) == 4
+    assert estimator.slope() == pytest.approx(10)
+
+
+def test_matches_direct_computation_after_many_observations():
+    # given:
+    rng = random.Random(0)
+    estimator = capacity.GrowthEstimator(16)
+    observations = []
+
+    # when:
+    for i in range(1000):
+        observation = (1.7e9 + i * 21600, 1e11 + i * 5e6 + rng.uniform(-1e8, 1e8))
+        observations.append(observation)
+        estimator.add(*observation)
+
+    # then:
+    window = observations[-16:]
+    mt = sum(t for t, _ in window) / 16
+    mv = sum(v for _, v in window) / 16
+    expected = sum((t - mt) * (v - mv) for t, v in window) / sum(
+        (t - mt) ** 2 for t, _ in window
+    )
+    assert estimator.slope() == pytest.approx(expected, rel=1e-6)
+
+
+def test_tracker_only_records_new_measurements():
+    # given:
+    tracker = capacity.CapacityTracker(8)
+    tracker.observe("tr3289", "Sun, 14 Apr 2024 09:01:01 PT", 0, 100)
+
+    # when:
+    unchanged = tracker.observe("tr3289", "Sun, 14 Apr 2024 09:01:01 PT", 10, 1e9)
+    changed = tracker.observe("tr3289", "Sun, 14 Apr 2024 09:01:11 PT", 10, 200)
+
+    # then:
+    assert unchanged is None
+    assert changed == pytest.approx(10)
@@ -1,7 +1,7 @@
 from prometheus_client.samples import Sample
 import pytest
 
-from rsync_net_exporter import collector
+from rsync_net_exporter import capacity, collector
 
 
 sample_xml = """\
@@ -192,3 +192,29 @@ def test_collector_raises_for_empty_rss_document(requests_mock):
     with pytest.raises(collector.CollectorException):
         # when:
         list(col.collect())
+
+
+def test_collector_capacity(requests_mock):
+    # given:
+    url = "https://rsync.example.net/blah.xml"
+    tracker = capacity.CapacityTracker()
+    requests_mock.get(url, text=sample_xml.replace("120.15", "100"))
+    list(collector.Collector(url, capacity_tracker=tracker).collect())
+    requests_mock.get(
+        url,
+        text=sample_xml.replace("120.15", "110").replace("09:01:01", "10:01:01"),
+    )
+
+    # when:
+    metrics = {
+        m.name: m for m in collector.Collector(url, capacity_tracker=tracker).collect()
+    }
+
+    # then:
+    growth = 10 * 2**30 / 3600
+    assert metrics["rsyncnet_account_billed_growth_bytes_per_second"].samples[
+        0
+    ].value == pytest.approx(growth)
+    assert metrics["rsyncnet_account_quota_full_seconds"].samples[
+        0
+    ].value == pytest.approx(10 * 2**30 / growth)
@@ -1,7 +1,12 @@
+import contextlib
+import datetime
+import json
 import logging
 import os
+from pathlib import Path
 import ssl
 import subprocess
+import time
 
 import pytest
 import requests
@@ -13,6 +18,34 @@ pytestmark = pytest.mark.container
 
 logger = logging.getLogger(__name__)
 
+IMAGE = "localhost/rsync.net-exporter"
+
+# Benchmark results are written here, as JSON, so that they can be compared
+# between builds of the image. dist/ is ignored by git.
+REPORT_PATH = Path(
+    os.environ.get(
+        "CONTAINER_BENCHMARK_REPORT",
+        Path(__file__).parent.parent / "dist" / "container-benchmark.json",
+    )
+)
+
+# Prints the resident set size (in KiB) of each gunicorn worker, i.e., each
+# child of the gunicorn arbiter (which runs as PID 1).
+WORKER_RSS_SCRIPT = """\
+import json, pathlib
+rss = {}
+for p in pathlib.Path("/proc").iterdir():
+    try:
+        status = dict(
+            line.split(":", 1) for line in (p / "status").read_text().splitlines()
+        )
+    except (FileNotFoundError, NotADirectoryError, ValueError):
+        continue
+    if status["PPid"].strip() == "1":
+        rss[p.name] = int(status["VmRSS"].split()[0])
+print(json.dumps(rss))
+"""
+
 
 @pytest.fixture()
 def session():
@@ -41,8 +74,12 @@ def httpserver_ssl_context(ca):
     return context
 
 
-@pytest.fixture(scope="module")
-def container(ca):
+@contextlib.contextmanager
+def run_container(ca):
+    """
+    Runs the image, yielding the container's ID and the address at which the
+    exporter is published.
+    """
     with ca.cert_pem.tempfile() as ca_temp_path:
         os.chmod(ca_temp_path, 0o644)
         p = subprocess.run(
@@ -57,7 +94,7 @@ def container(ca):
                 "--add-host=www.rsync.net:10.0.2.2",
                 f"--volume={ca_temp_path}:/tmp/ca-bundle.crt:ro,Z",
                 "--env=REQUESTS_CA_BUNDLE=/tmp/ca-bundle.crt",
-                "localhost/rsync.net-exporter",
+                IMAGE,
                 "--log-level=debug",
             ],
             stdout=subprocess.PIPE,
@@ -77,7 +114,7 @@ def container(ca):
             host, sep, port_ = p2.stdout.rstrip().partition(":")
             addr = (host, int(port_))
 
-            yield addr
+            yield ctr, addr
         finally:
             try:
                 p3 = subprocess.run(
@@ -97,6 +134,12 @@ def container(ca):
                 )
 
 
+@pytest.fixture(scope="module")
+def container(ca):
+    with run_container(ca) as (ctr, addr):
+        yield addr
+
+
 def test_metrics(container, session):
     # given:
     url = f"http://{container[0]}:{container[1]}/metrics"
@@ -179,3 +222,92 @@ def test_probe(container, rsync_net_server, session):
     # then:
     rsync_net_server.check()
     r.raise_for_status()
+
+
+@pytest.fixture(scope="module")
+def benchmark_report():
+    """
+    Benchmark tests add their results to this dict, which is written to
+    REPORT_PATH when they have all run.
+    """
+    report = {}
+    yield report
+
+    p = subprocess.run(
+        ["podman", "image", "inspect", "--format={{.Id}}", IMAGE],
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    REPORT_PATH.write_text(
+        json.dumps(
+            {
+                "image": p.stdout.strip(),
+                "date": datetime.datetime.now(tz=datetime.UTC).isoformat(),
+                "results": report,
+            },
+            indent=2,
+            sort_keys=True,
+        )
+        + "\n"
+    )
+    logger.info("Wrote benchmark report to %s", REPORT_PATH)
+
+
+def worker_rss_kib(ctr):
+    p = subprocess.run(
+        ["podman", "exec", ctr, "venv/bin/python", "-I", "-c", WORKER_RSS_SCRIPT],
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return sorted(json.loads(p.stdout).values())
+
+
+def test_benchmark_image_size(benchmark_report):
+    # when:
+    p = subprocess.run(
+        ["podman", "image", "inspect", "--format={{.Size}}", IMAGE],
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+
+    # then:
+    benchmark_report["image_size_bytes"] = int(p.stdout)
+
+
+def test_benchmark_startup_and_memory(ca, rsync_net_server, benchmark_report):
+    # given:
+    target = f"https://www.rsync.net:{rsync_net_server.port}/rss.xml"
+    start = time.monotonic()
+
+    # when:
+    with run_container(ca) as (ctr, addr):
+        url = f"http://{addr[0]}:{addr[1]}/probe"
+        while True:
+            try:
+                r = requests.get(url, params={"target": target}, timeout=2)
+                if r.ok:
+                    break
+            except requests.ConnectionError:
+                pass
+            if time.monotonic() - start > 60:
+                pytest.fail("No successful probe within 60 seconds")
+            time.sleep(0.01)
+        first_probe = time.monotonic() - start
+
+        time.sleep(5)
+        idle = worker_rss_kib(ctr)
+
+        with requests.Session() as sess:
+            for _ in range(500):
+                sess.get(url, params={"target": target}, timeout=2).raise_for_status()
+        loaded = worker_rss_kib(ctr)
+
+    # then:
+    benchmark_report["run_to_first_probe_seconds"] = first_probe
+    benchmark_report["worker_rss_idle_kib"] = idle
+    benchmark_report["worker_rss_loaded_kib"] = loaded
+    assert idle and loaded
@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+
+from rsync_net_exporter import collector, corpus, feed, replay, upstream
+
+
+TARGET = "https://rsync.example.net/rss/abc123def456ghi789"
+
+
+def record(requests_mock, body, directory):
+    requests_mock.get(
+        TARGET, text=body, headers={"Content-Type": "text/xml", "Server": "x"}
+    )
+    col = collector.Collector(TARGET, recorder=corpus.Recorder(directory, b"key"))
+    list(col.collect())
+    return list(corpus.load(directory))
+
+
+@pytest.fixture
+def recorded(requests_mock, sample_xml, tmp_path):
+    record(requests_mock, sample_xml, tmp_path)
+    return record(requests_mock, sample_xml, tmp_path)
+
+
+def test_recorded_responses_scrubbed(recorded):
+    # then:
+    assert len(recorded) == 2
+    for entry in recorded:
+        assert "abc123def456ghi789" not in entry.path
+        assert "tr3289" not in entry.body
+        assert "myspace" not in entry.body
+        assert entry.headers == {"Content-Type": "text/xml"}
+
+
+def test_pseudonyms_consistent(recorded):
+    # when:
+    parsed = [feed.Parser().parse(entry.body.encode()) for entry in recorded]
+
+    # then:
+    assert recorded[0].path == recorded[1].path
+    assert parsed[0] == parsed[1]
+    assert parsed[0].accounts[0].quota == 120 * 2**30
+
+
+@pytest.mark.parametrize(
+    "uid,nickname",
+    [
+        ("tr3289", "rss"),
+        ("tr3289", "item"),
+        ("tr3289", "120"),
+        ("quota_gb", "myspace"),
+        ("2", "channel"),
+    ],
+)
+def test_scrubbed_corpus_still_parses(
+    requests_mock, sample_xml, tmp_path, uid, nickname
+):
+    # given:
+    body = sample_xml.replace("tr3289", uid).replace("myspace", nickname)
+
+    # when:
+    [entry] = record(requests_mock, body, tmp_path)
+
+    # then:
+    [account] = feed.Parser().parse(entry.body.encode()).accounts
+    assert account.uid not in (uid, nickname)
+    assert account.nickname not in (uid, nickname)
+    assert account.quota == 120 * 2**30
+    assert account.idle == 2 * 86400
+
+
+def test_rejected_response_not_recorded(requests_mock, tmp_path):
+    # then:
+    with pytest.raises(collector.CollectorException):
+        # when:
+        record(requests_mock, "<hello/>", tmp_path)
+
+    assert not list(corpus.load(tmp_path))
+
+
+def test_replay(recorded, requests_mock):
+    # given:
+    requests_mock.real_http = True
+    replayer = replay.Replayer(recorded, speed=0)
+    server = replay.make_server(replayer, ("127.0.0.1", 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+
+    # when:
+    try:
+        body = upstream.Upstream().fetch(f"http://{host}:{port}{recorded[0].path}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # then:
+    assert body == recorded[0].body.encode()
+
+
+def test_replay_speed():
+    # given:
+    sleeps = []
+    replayer = replay.Replayer([], speed=10, sleep=sleeps.append)
+
+    # when:
+    replayer.delay(2.5)
+
+    # then:
+    assert sleeps == [0.25]
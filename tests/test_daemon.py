@@ -0,0 +1,127 @@
+from prometheus_client.parser import text_string_to_metric_families
+import pytest
+
+from rsync_net_exporter import capacity, daemon, feed, upstream
+
+
+TARGET = "https://rsync.example.net/blah.xml"
+TARGET_BROKEN = "https://rsync.example.net/broken.xml"
+
+
+@pytest.fixture
+def feeds(requests_mock, sample_xml):
+    requests_mock.get(TARGET, text=sample_xml)
+    requests_mock.get(TARGET_BROKEN, status_code=500)
+    return requests_mock
+
+
+def test_textfile(feeds, tmp_path):
+    # given:
+    path = tmp_path / "rsync.net.prom"
+    output = daemon.TextfileOutput(path, max_unchanged=3600)
+
+    # when:
+    daemon.run_once(
+        [TARGET, TARGET_BROKEN],
+        upstream.Upstream(),
+        feed.Parser(),
+        capacity.CapacityTracker(),
+        [output],
+    )
+
+    # then:
+    families = {f.name: f for f in text_string_to_metric_families(path.read_text())}
+    assert {
+        (s.labels["target"], s.value)
+        for s in families["rsyncnet_probe_success"].samples
+    } == {(TARGET, 1), (TARGET_BROKEN, 0)}
+    assert families["rsyncnet_account_quota_bytes"].samples[0].labels == {
+        "uid": "tr3289",
+        "nickname": "myspace",
+        "location": "CH",
+        "target": TARGET,
+    }
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_unchanged_data_not_rewritten(feeds, tmp_path):
+    # given:
+    path = tmp_path / "rsync.net.prom"
+    output = daemon.TextfileOutput(path, max_unchanged=3600)
+    daemon.run_once(
+        [TARGET],
+        upstream.Upstream(),
+        feed.Parser(),
+        capacity.CapacityTracker(),
+        [output],
+    )
+    path.unlink()
+
+    # when:
+    daemon.run_once(
+        [TARGET],
+        upstream.Upstream(),
+        feed.Parser(),
+        capacity.CapacityTracker(),
+        [output],
+    )
+
+    # then:
+    assert not path.exists()
+
+
+def test_unchanged_data_rewritten_after_max_unchanged(feeds, tmp_path):
+    # given:
+    path = tmp_path / "rsync.net.prom"
+    output = daemon.TextfileOutput(path, max_unchanged=0)
+    daemon.run_once(
+        [TARGET],
+        upstream.Upstream(),
+        feed.Parser(),
+        capacity.CapacityTracker(),
+        [output],
+    )
+    path.unlink()
+
+    # when:
+    daemon.run_once(
+        [TARGET],
+        upstream.Upstream(),
+        feed.Parser(),
+        capacity.CapacityTracker(),
+        [output],
+    )
+
+    # then:
+    assert path.exists()
+
+
+def test_pushgateway(feeds, httpserver):
+    # given:
+    httpserver.expect_request("/metrics/job/rsync.net", method="PUT").respond_with_data(
+        ""
+    )
+    output = daemon.PushgatewayOutput(
+        f"http://localhost:{httpserver.port}", "rsync.net", max_unchanged=3600
+    )
+
+    # when:
+    daemon.run_once(
+        [TARGET],
+        upstream.Upstream(),
+        feed.Parser(),
+        capacity.CapacityTracker(),
+        [output],
+    )
+    daemon.run_once(
+        [TARGET],
+        upstream.Upstream(),
+        feed.Parser(),
+        capacity.CapacityTracker(),
+        [output],
+    )
+
+    # then:
+    httpserver.check()
+    assert len(httpserver.log) == 1
+    assert b"rsyncnet_account_quota_bytes" in httpserver.log[0][0].data
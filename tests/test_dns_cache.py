@@ -0,0 +1,146 @@
+from types import SimpleNamespace
+
+import pytest
+
+from rsync_net_exporter import dns_cache
+
+
+def test_cache_hit(resolver, clock):
+    # given:
+    cache = dns_cache.DnsCache(5, 300, resolver, clock)
+
+    # when:
+    cache.resolve("www.rsync.net", 443)
+    addresses = cache.resolve("www.rsync.net", 443)
+
+    # then:
+    assert addresses == ["192.0.2.1"]
+    assert resolver.calls == 1
+
+
+@pytest.mark.parametrize(
+    "ttl,expected_lifetime",
+    [
+        (None, 300),
+        (1, 5),
+        (60, 60),
+        (86400, 300),
+    ],
+)
+def test_ttl_clamped(resolver, clock, ttl, expected_lifetime):
+    # given:
+    resolver.ttl = ttl
+    cache = dns_cache.DnsCache(5, 300, resolver, clock)
+    cache.resolve("www.rsync.net", 443)
+
+    # when:
+    clock.now += expected_lifetime - 0.5
+    cache.resolve("www.rsync.net", 443)
+    clock.now += 1
+    cache.resolve("www.rsync.net", 443)
+
+    # then:
+    assert resolver.calls == 2
+
+
+def test_last_good_answer_used_on_failure(resolver, clock):
+    # given:
+    cache = dns_cache.DnsCache(5, 300, resolver, clock)
+    cache.resolve("www.rsync.net", 443)
+    clock.now += 301
+    resolver.answer = OSError("resolver on fire")
+
+    # when:
+    addresses = cache.resolve("www.rsync.net", 443)
+
+    # then:
+    assert addresses == ["192.0.2.1"]
+
+
+def test_failure_without_last_good_answer(resolver):
+    # given:
+    resolver.answer = OSError("resolver on fire")
+    cache = dns_cache.DnsCache(5, 300, resolver)
+
+    # then:
+    with pytest.raises(OSError):
+        # when:
+        cache.resolve("www.rsync.net", 443)
+
+
+def test_address_literal_not_resolved(resolver):
+    # given:
+    cache = dns_cache.DnsCache(5, 300, resolver)
+
+    # when:
+    addresses = cache.resolve("198.51.100.1", 443)
+
+    # then:
+    assert addresses == ["198.51.100.1"]
+    assert resolver.calls == 0
+
+
+class FakeAnswer:
+    def __init__(self, addresses, ttl):
+        self.rdatas = [SimpleNamespace(address=a) for a in addresses]
+        self.rrset = SimpleNamespace(ttl=ttl)
+
+    def __iter__(self):
+        return iter(self.rdatas)
+
+
+def test_dnspython_resolver(monkeypatch):
+    # given:
+    resolver = pytest.importorskip("dns.resolver")
+    answers = {
+        "A": FakeAnswer(["192.0.2.1"], 60),
+        "AAAA": FakeAnswer(["2001:db8::1"], 30),
+    }
+    monkeypatch.setattr(resolver, "resolve", lambda host, rdtype: answers[rdtype])
+
+    # when:
+    result = dns_cache.dnspython_resolver("www.rsync.net", 443)
+
+    # then:
+    assert result == (["192.0.2.1", "2001:db8::1"], 30)
+
+
+def test_dnspython_resolver_failure(monkeypatch):
+    # given:
+    resolver = pytest.importorskip("dns.resolver")
+
+    def nxdomain(host, rdtype):
+        raise resolver.NXDOMAIN()
+
+    monkeypatch.setattr(resolver, "resolve", nxdomain)
+
+    # then:
+    with pytest.raises(OSError):
+        # when:
+        dns_cache.dnspython_resolver("www.rsync.invalid", 443)
+
+
+def test_resolver_from_config(monkeypatch):
+    # given:
+    resolver = pytest.importorskip("dns.resolver")
+    lookups = []
+
+    def resolve(host, rdtype):
+        lookups.append(rdtype)
+        return FakeAnswer(["192.0.2.1"] if rdtype == "A" else [], 60)
+
+    monkeypatch.setattr(resolver, "resolve", resolve)
+    cache = dns_cache.DnsCache.from_config(
+        {
+            "DNS_CACHE_RESOLVER": "dnspython",
+            "DNS_CACHE_MIN_TTL": 5,
+            "DNS_CACHE_MAX_TTL": 300,
+        }
+    )
+
+    # when:
+    addresses = [cache.resolve("www.rsync.net", 443) for _ in range(2)]
+
+    # then:
+    assert addresses == [["192.0.2.1"]] * 2
+    assert lookups == ["A", "AAAA"]
@@ -1,3 +1,7 @@
+import os
+import subprocess
+import sys
+
 import pytest
 from unittest import mock
 
@@ -80,3 +84,36 @@ def test_with_target_allowed(client, app_context, requests_mock):
 
     # then:
     assert res.status.startswith("200 ")
+
+
+MULTIPROCESS_SCRIPT = """\
+import os
+
+from rsync_net_exporter import create_app, log_config, upstream
+
+for _ in range(2):
+    if (pid := os.fork()) == 0:
+        upstream.RESPONSE_BYTES.observe(1000)
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+app = create_app(host=log_config.Host.PYTEST)
+print(app.test_client().get("/metrics").text)
+"""
+
+
+def test_metrics_aggregated_across_processes(tmp_path):
+    # given:
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+
+    # when:
+    p = subprocess.run(
+        [sys.executable, "-c", MULTIPROCESS_SCRIPT],
+        env=env,
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+
+    # then:
+    assert "rsyncnet_exporter_upstream_response_bytes_count 2.0" in p.stdout
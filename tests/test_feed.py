@@ -0,0 +1,89 @@
+import zoneinfo
+
+import pytest
+
+from rsync_net_exporter import feed
+
+
+def test_parse(sample_xml):
+    # given:
+    parser = feed.Parser()
+
+    # when:
+    parsed = parser.parse(sample_xml.encode())
+
+    # then:
+    assert parsed.last_build_date == "Sun, 14 Apr 2024 09:18:46 PT"
+    assert [a.uid for a in parsed.accounts] == ["tr3289"]
+    assert parsed.accounts[0].quota == 120 * 2**30
+    assert parsed.accounts[0].idle == 2 * 86400
+
+
+def test_unexpected_root_element():
+    # given:
+    parser = feed.Parser()
+
+    # then:
+    with pytest.raises(feed.FeedError):
+        # when:
+        parser.parse(b"<hello><channel><item/></channel></hello>")
+
+
+@pytest.mark.parametrize(
+    "body,reason",
+    [
+        (b"<rss>" + b"<channel/>" * 100 + b"</rss>", "elements"),
+        (b"<rss>" + b"<a>" * 20 + b"</a>" * 20 + b"</rss>", "depth"),
+        (
+            b'<!DOCTYPE rss [<!ENTITY a "aaaaaaaaaa">]><rss>&a;</rss>',
+            "doctype",
+        ),
+    ],
+)
+def test_limits(body, reason):
+    # given:
+    parser = feed.Parser(max_elements=50, max_depth=8)
+
+    # then:
+    with pytest.raises(feed.ParseLimitExceeded) as exc_info:
+        # when:
+        parser.parse(body)
+
+    assert exc_info.value.reason == reason
+
+
+def test_element_limit_checked_before_document_fully_parsed():
+    # given:
+    parser = feed.Parser(max_elements=10)
+    body = b"<rss><channel>" + b"<item/>" * 100_000
+
+    # then:
+    with pytest.raises(feed.ParseLimitExceeded):
+        # when:
+        parser.parse(body)
+
+
+def test_parse_date():
+    # when:
+    parsed = feed.parse_date("Sun, 14 Apr 2024 09:01:01 PT")
+
+    # then:
+    assert parsed == 1713110461
+
+
+def test_parse_date_without_time_zone_database(monkeypatch):
+    # given:
+    def not_found(key):
+        raise zoneinfo.ZoneInfoNotFoundError(key)
+
+    monkeypatch.setattr(zoneinfo, "ZoneInfo", not_found)
+    feed._zone.cache_clear()
+
+    # when:
+    try:
+        parsed = feed.parse_date("Sun, 14 Apr 2024 09:01:01 PT")
+    finally:
+        feed._zone.cache_clear()
+
+    # then:
+    assert parsed is None
@@ -0,0 +1,139 @@
+import json
+import logging
+import sys
+import threading
+
+import prometheus_client
+
+from rsync_net_exporter import log_config
+
+
+def dropped(reason):
+    return (
+        prometheus_client.REGISTRY.get_sample_value(
+            "rsyncnet_exporter_log_records_dropped_total", {"reason": reason}
+        )
+        or 0
+    )
+
+
+def record(msg, args=("x",), level=logging.DEBUG, name="rsync_net_exporter.feed"):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_rate_limit_filter(clock):
+    # given:
+    f = log_config.RateLimitFilter(
+        rate=1, burst=2, max_level=logging.DEBUG, clock=clock
+    )
+    before = dropped("rate_limited")
+
+    # when:
+    burst = [f.filter(record("Skipping item %r")) for _ in range(3)]
+    other = f.filter(record("Something else %r"))
+    info = f.filter(record("Skipping item %r", level=logging.INFO))
+    clock.now = 1
+    refilled = f.filter(record("Skipping item %r"))
+
+    # then:
+    assert burst == [True, True, False]
+    assert other
+    assert info
+    assert refilled
+    assert dropped("rate_limited") - before == 1
+
+
+class Collecting(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.unblock = threading.Event()
+
+    def emit(self, record):
+        self.unblock.wait(5)
+        self.records.append(record)
+
+
+def test_queue_handler_drops_when_full():
+    # given:
+    target = Collecting()
+    handler = log_config.queue_handler([target], size=1)
+    before = dropped("queue_full")
+
+    # when:
+    for i in range(5):
+        handler.handle(record(f"message {i}", args=None, level=logging.INFO))
+    target.unblock.set()
+
+    # then:
+    assert dropped("queue_full") - before >= 3
+
+
+class Formatting(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+        self.written = threading.Event()
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+        self.written.set()
+
+
+def test_queue_handler_leaves_formatting_to_handlers():
+    # given:
+    target = Formatting()
+    target.setFormatter(log_config.JsonFormatter())
+    handler = log_config.queue_handler([target], size=10)
+
+    # when:
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        r = record("Failed to parse %r", level=logging.ERROR)
+        r.exc_info = sys.exc_info()
+        handler.handle(r)
+    target.written.wait(5)
+
+    # then:
+    doc = json.loads(target.lines[0])
+    assert doc["message"] == "Failed to parse 'x'"
+    assert doc["exception"].endswith("ValueError: boom")
+
+
+def test_gunicorn_file_handlers_left_in_place(tmp_path):
+    # given:
+    logger = logging.getLogger("gunicorn.access")
+    file_handler = logging.FileHandler(tmp_path / "access.log")
+    stream_handler = logging.StreamHandler()
+    logger.addHandler(file_handler)
+    logger.addHandler(stream_handler)
+
+    # when:
+    try:
+        log_config.Host.GUNICORN.configure_logging({"LOG_FORMAT": "json"})
+        handlers = list(logger.handlers)
+    finally:
+        for h in list(logger.handlers):
+            logger.removeHandler(h)
+        file_handler.close()
+
+    # then:
+    assert file_handler in handlers
+    assert stream_handler not in handlers
+    assert len(handlers) == 2
+    assert isinstance(file_handler.formatter, log_config.JsonFormatter)
+
+
+def test_json_formatter():
+    # given:
+    formatter = log_config.JsonFormatter()
+
+    # when:
+    line = formatter.format(record("Skipping item %r"))
+
+    # then:
+    doc = json.loads(line)
+    assert doc["level"] == "DEBUG"
+    assert doc["logger"] == "rsync_net_exporter.feed"
+    assert doc["message"] == "Skipping item 'x'"
@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import signal
+
+import prometheus_client
+import pytest
+
+from rsync_net_exporter import feed, parse_pool
+
+
+@pytest.fixture
+def pooled():
+    parser = parse_pool.PooledParser(processes=1, max_queued=1, threshold=1024)
+    yield parser
+    parser.shutdown()
+
+
+def parses(where):
+    return (
+        prometheus_client.REGISTRY.get_sample_value(
+            "rsyncnet_exporter_parses_total", {"where": where}
+        )
+        or 0
+    )
+
+
+def test_small_document_parsed_inline(pooled):
+    # given:
+    body = b"<rss><channel><item><uid>tr3289</uid></item></channel></rss>"
+    before = parses("inline")
+
+    # when:
+    parsed = pooled.parse(body)
+
+    # then:
+    assert [a.uid for a in parsed.accounts] == ["tr3289"]
+    assert parses("inline") - before == 1
+
+
+def test_large_document_parsed_in_pool(pooled, sample_xml):
+    # given:
+    body = sample_xml.encode()
+    before = parses("pool")
+
+    # when:
+    parsed = pooled.parse(body)
+
+    # then:
+    assert parsed == feed.Parser().parse(body)
+    assert parses("pool") - before == 1
+
+
+def test_limit_exceeded_in_pool():
+    # given:
+    pooled = parse_pool.PooledParser(max_elements=10, processes=1, threshold=0)
+    body = b"<rss><channel>" + b"<item/>" * 100 + b"</channel></rss>"
+
+    # then:
+    with pytest.raises(feed.ParseLimitExceeded) as exc_info:
+        # when:
+        try:
+            pooled.parse(body)
+        finally:
+            pooled.shutdown()
+
+    assert exc_info.value.reason == "elements"
+
+
+def test_broken_pool_replaced(pooled, sample_xml):
+    # given:
+    body = sample_xml.encode()
+    pooled.parse(body)
+    for child in multiprocessing.active_children():
+        os.kill(child.pid, signal.SIGKILL)
+        child.join()
+    before = {where: parses(where) for where in ["broken", "pool"]}
+
+    # when:
+    parsed = pooled.parse(body)
+    parsed_again = pooled.parse(body)
+
+    # then:
+    assert parsed == parsed_again == feed.Parser().parse(body)
+    assert parses("broken") - before["broken"] == 1
+    assert parses("pool") - before["pool"] == 1
+
+
+def metric_file_pids(directory):
+    return {path.stem.rpartition("_")[2] for path in directory.glob("*.db")}
+
+
+def test_metric_files_removed(monkeypatch, tmp_path, sample_xml):
+    # given: the pool's processes inherit the multiprocess mode directory
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    pooled = parse_pool.PooledParser(processes=1, threshold=0)
+    body = sample_xml.encode()
+    pooled.parse(body)
+    [killed] = metric_file_pids(tmp_path)
+    for child in multiprocessing.active_children():
+        os.kill(child.pid, signal.SIGKILL)
+        child.join()
+
+    # when:
+    pooled.parse(body)
+    pooled.parse(body)
+    replaced = metric_file_pids(tmp_path)
+    pooled.shutdown()
+
+    # then:
+    assert killed not in replaced and len(replaced) == 1
+    assert not metric_file_pids(tmp_path)
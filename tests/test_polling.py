@@ -0,0 +1,131 @@
+import email.utils
+
+import pytest
+
+from rsync_net_exporter import collector, feed, polling
+
+
+def built_at(t):
+    return feed.Feed(email.utils.formatdate(t, usegmt=True), [])
+
+
+def measured_at(t, served):
+    account = feed.Account(
+        uid="tr3289",
+        nickname="",
+        location="CH",
+        pub_date=email.utils.formatdate(t, usegmt=True),
+        quota=None,
+        billed=None,
+        dataset=None,
+        inodes=None,
+        snap_used_free=None,
+        snap_used_custom=0,
+        idle=None,
+    )
+    return feed.Feed(email.utils.formatdate(served, usegmt=True), [account])
+
+
+@pytest.fixture
+def poller(clock):
+    return polling.AdaptivePoller(min_interval=60, max_interval=7200, clock=clock)
+
+
+def test_cached_until_min_interval_while_cadence_unknown(clock, poller):
+    # given:
+    poller.update("t", built_at(0))
+
+    # when:
+    clock.now = 59
+    before = poller.cached("t")
+    clock.now = 60
+    after = poller.cached("t")
+
+    # then:
+    assert before == built_at(0)
+    assert after is None
+
+
+def test_cached_until_next_build_expected(clock, poller):
+    # given:
+    poller.update("t", built_at(0))
+    clock.now = 3600
+    poller.update("t", built_at(3600))
+
+    # when:
+    clock.now = 7199
+    before = poller.cached("t")
+    clock.now = 7200
+    after = poller.cached("t")
+
+    # then:
+    assert before == built_at(3600)
+    assert after is None
+
+
+def test_overdue_build_fetched_at_min_interval(clock, poller):
+    # given:
+    poller.update("t", built_at(0))
+    clock.now = 3600
+    poller.update("t", built_at(3600))
+
+    # when:
+    clock.now = 7200
+    poller.update("t", built_at(3600))
+    clock.now = 7259
+    before = poller.cached("t")
+    clock.now = 7260
+    after = poller.cached("t")
+
+    # then:
+    assert before is not None
+    assert after is None
+
+
+def test_delay_capped_at_max_interval(clock):
+    # given:
+    poller = polling.AdaptivePoller(min_interval=60, max_interval=600, clock=clock)
+    poller.update("t", built_at(0))
+    clock.now = 3600
+    poller.update("t", built_at(3600))
+
+    # when:
+    clock.now = 4200
+    cached = poller.cached("t")
+
+    # then:
+    assert cached is None
+
+
+def test_cadence_learned_from_item_dates(clock, poller):
+    # given: a feed whose lastBuildDate is the time it was served
+    poller.update("t", measured_at(0, served=10))
+    clock.now = 3610
+    poller.update("t", measured_at(3600, served=3610))
+    clock.now = 3670
+    poller.update("t", measured_at(3600, served=3670))
+
+    # when:
+    clock.now = 7199
+    before = poller.cached("t")
+    clock.now = 7200
+    after = poller.cached("t")
+
+    # then:
+    assert before is not None
+    assert after is None
+
+
+def test_collector_uses_cached_feed(requests_mock, sample_xml):
+    # given:
+    url = "https://rsync.example.net/blah.xml"
+    requests_mock.get(url, text=sample_xml)
+    poller = polling.AdaptivePoller(min_interval=60, max_interval=3600)
+    list(collector.Collector(url, poller=poller).collect())
+
+    # when:
+    families = list(collector.Collector(url, poller=poller).collect())
+
+    # then:
+    assert requests_mock.call_count == 1
+    assert any(f.name == "rsyncnet_account_quota_bytes" for f in families)
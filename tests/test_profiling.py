@@ -0,0 +1,168 @@
+import marshal
+
+import pytest
+
+from rsync_net_exporter import profiling
+
+
+TARGET = "https://rsync.example.net/blah.xml"
+
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    monkeypatch.setattr(profiling, "_session", None)
+    return make_app(PROFILING_ENABLED="true", PROFILING_TOKEN="s3cret")
+
+
+@pytest.fixture
+def client(app, requests_mock, sample_xml):
+    requests_mock.get(TARGET, text=sample_xml)
+    return app.test_client()
+
+
+AUTH = {"Authorization": "Bearer s3cret"}
+
+
+def test_disabled_by_default(make_app, monkeypatch):
+    # given:
+    monkeypatch.setattr(profiling, "_session", None)
+    app = make_app()
+
+    # when:
+    res = app.test_client().post("/debug/profile", headers=AUTH)
+
+    # then:
+    assert res.status.startswith("404 ")
+
+
+def test_token_required(make_app):
+    # then:
+    with pytest.raises(ValueError):
+        # when:
+        make_app(PROFILING_ENABLED="true")
+
+
+@pytest.mark.parametrize(
+    "headers",
+    [
+        {},
+        {"Authorization": "Bearer wrong"},
+        {"Authorization": "Basic czNjcmV0"},
+    ],
+)
+def test_unauthorized(client, headers):
+    res = client.post("/debug/profile", headers=headers)
+    assert res.status.startswith("401 ")
+
+
+@pytest.mark.parametrize(
+    "query_string",
+    [
+        {"seconds": "nan"},
+        {"seconds": "inf"},
+        {"seconds": "-inf"},
+        {"seconds": 0},
+        {"seconds": -1},
+        {"probes": 0},
+        {"probes": -1},
+        {"seconds": "soon"},
+    ],
+)
+def test_invalid_session_rejected(client, query_string):
+    # when:
+    res = client.post("/debug/profile", query_string=query_string, headers=AUTH)
+
+    # then:
+    assert res.status.startswith("400 ")
+    assert profiling._session is None
+
+
+def test_session_ends_at_deadline_without_probes(client):
+    # given:
+    client.post("/debug/profile", query_string={"seconds": 0.1}, headers=AUTH)
+
+    # when:
+    finished = profiling._session.done.wait(5)
+
+    # then:
+    assert finished
+    assert client.post("/debug/profile", headers=AUTH).status.startswith("202 ")
+
+
+def test_stop(client):
+    # given:
+    client.post("/debug/profile", headers=AUTH)
+
+    # when:
+    res = client.delete("/debug/profile", headers=AUTH)
+    res_again = client.delete("/debug/profile", headers=AUTH)
+
+    # then:
+    assert res.status.startswith("200 ")
+    assert res_again.status.startswith("404 ")
+    assert client.get("/debug/profile/tracemalloc", headers=AUTH).status.startswith(
+        "200 "
+    )
+
+
+def test_deterministic_over_probes(client):
+    # given:
+    res = client.post("/debug/profile", query_string={"probes": 2}, headers=AUTH)
+    assert res.status.startswith("202 ")
+
+    # when:
+    for _ in range(2):
+        client.get("/probe", query_string={"target": TARGET})
+    res_text = client.get("/debug/profile", headers=AUTH)
+    res_pstats = client.get(
+        "/debug/profile", query_string={"format": "pstats"}, headers=AUTH
+    )
+    res_tracemalloc = client.get("/debug/profile/tracemalloc", headers=AUTH)
+
+    # then:
+    assert res_text.status.startswith("200 ") and "collect" in res_text.text
+    assert any(
+        func == "collect_account" for _, _, func in marshal.loads(res_pstats.data)
+    )
+    assert res_tracemalloc.status.startswith("200 ")
+
+
+def test_results_unavailable_while_running(client):
+    # given:
+    client.post("/debug/profile", query_string={"probes": 2}, headers=AUTH)
+
+    # when:
+    client.get("/probe", query_string={"target": TARGET})
+    res = client.get("/debug/profile", headers=AUTH)
+
+    # then:
+    assert res.status.startswith("404 ")
+
+
+def test_only_one_session(client):
+    # given:
+    client.post("/debug/profile", query_string={"probes": 1}, headers=AUTH)
+
+    # when:
+    res = client.post("/debug/profile", headers=AUTH)
+
+    # then:
+    assert res.status.startswith("409 ")
+
+
+def test_sampling(client):
+    # given:
+    client.post(
+        "/debug/profile",
+        query_string={"mode": "sampling", "seconds": 0.2},
+        headers=AUTH,
+    )
+    client.get("/probe", query_string={"target": TARGET})
+    profiling._session.done.wait(5)
+
+    # when:
+    res = client.get("/debug/profile", headers=AUTH)
+
+    # then:
+    assert res.status.startswith("200 ")
+    assert all(line.rpartition(" ")[2].isdigit() for line in res.text.splitlines())
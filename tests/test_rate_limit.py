@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from rsync_net_exporter import rate_limit
+
+
+def test_burst_not_delayed():
+    # given:
+    limiter = rate_limit.HostRateLimiter(rate=0.001, burst=3, max_wait=10)
+    start = time.monotonic()
+
+    # when:
+    for _ in range(3):
+        limiter.acquire("https://rsync.example.net/a.xml")
+
+    # then:
+    assert time.monotonic() - start < 0.5
+
+
+def test_gives_up_after_max_wait():
+    # given:
+    limiter = rate_limit.HostRateLimiter(rate=0.001, burst=1, max_wait=0.1)
+    limiter.acquire("https://rsync.example.net/a.xml")
+
+    # then:
+    with pytest.raises(rate_limit.RateLimitExceeded):
+        # when:
+        limiter.acquire("https://rsync.example.net/b.xml")
+
+
+def test_hosts_limited_separately():
+    # given:
+    limiter = rate_limit.HostRateLimiter(rate=0.001, burst=1, max_wait=0.1)
+    limiter.acquire("https://rsync.example.net/a.xml")
+
+    # when:
+    limiter.acquire("https://other.example.net/a.xml")
+
+    # then: (no RateLimitExceeded)
+
+
+def test_targets_served_round_robin():
+    # given:
+    limiter = rate_limit.HostRateLimiter(rate=20, burst=1, max_wait=10)
+    limiter.acquire("https://rsync.example.net/warmup.xml")
+    order = []
+    lock = threading.Lock()
+
+    def fetch(target):
+        limiter.acquire(f"https://rsync.example.net/{target}.xml")
+        with lock:
+            order.append(target)
+
+    threads = []
+    for target in ["a", "a", "a", "b"]:
+        threads.append(threading.Thread(target=fetch, args=(target,)))
+        threads[-1].start()
+        time.sleep(0.005)
+
+    # when:
+    for t in threads:
+        t.join()
+
+    # then:
+    assert order.index("b") <= 1
@@ -0,0 +1,122 @@
+import prometheus_client
+
+from rsync_net_exporter import capacity, state
+
+
+def evictions(reason):
+    return (
+        prometheus_client.REGISTRY.get_sample_value(
+            "rsyncnet_exporter_state_evictions_total", {"reason": reason}
+        )
+        or 0
+    )
+
+
+def test_least_recently_used_evicted_beyond_max_entries():
+    # given:
+    store = state.StateStore(max_entries=2, max_bytes=1000, ttl=60)
+    store.put("a", 1, size=1)
+    store.put("b", 2, size=1)
+    store.get("a")
+    before = evictions("entries")
+
+    # when:
+    store.put("c", 3, size=1)
+
+    # then:
+    assert store.get("a") == 1
+    assert store.get("b") is None
+    assert store.get("c") == 3
+    assert evictions("entries") - before == 1
+
+
+def test_evicted_beyond_max_bytes():
+    # given:
+    store = state.StateStore(max_entries=100, max_bytes=10, ttl=60)
+    store.put("a", 1, size=4)
+    store.put("b", 2, size=4)
+
+    # when:
+    store.put("c", 3, size=4)
+
+    # then:
+    assert len(store) == 2
+    assert store.bytes == 8
+    assert store.get("a") is None
+
+
+def test_replacing_entry_updates_bytes():
+    # given:
+    store = state.StateStore(max_entries=100, max_bytes=10, ttl=60)
+    store.put("a", 1, size=4)
+
+    # when:
+    store.put("a", 2, size=6)
+
+    # then:
+    assert store.bytes == 6
+    assert store.get("a") == 2
+
+
+def test_entry_larger_than_max_bytes_not_stored():
+    # given:
+    store = state.StateStore(max_entries=100, max_bytes=10, ttl=60)
+
+    # when:
+    store.put("a", 1, size=11)
+
+    # then:
+    assert store.get("a") is None
+
+
+def test_unused_entries_expire(clock):
+    # given:
+    store = state.StateStore(max_entries=100, max_bytes=1000, ttl=60, clock=clock)
+    store.put("a", 1, size=1)
+    store.put("b", 2, size=1)
+    clock.now = 30
+    store.get("b")
+
+    # when:
+    clock.now = 60
+
+    # then:
+    assert store.get("a") is None
+    assert store.get("b") == 2
+    assert len(store) == 1
+
+
+def test_namespaces_separate():
+    # given:
+    store = state.StateStore()
+    a = state.Namespace[int](store, "a")
+    b = state.Namespace[int](store, "b")
+
+    # when:
+    a.put("key", 1)
+
+    # then:
+    assert a.get("key") == 1
+    assert b.get("key") is None
+
+
+def test_approximate_size_includes_referents():
+    # given:
+    small = [1.5]
+    large = [float(i) for i in range(1000)]
+
+    # then:
+    assert state.approximate_size(large) > state.approximate_size(small) + 24 * 999
+
+
+def test_capacity_tracker_bounded():
+    # given:
+    store = state.StateStore(max_entries=3, max_bytes=2**20, ttl=60)
+    tracker = capacity.CapacityTracker(8, store)
+
+    # when:
+    for i in range(10):
+        tracker.observe(f"tr{i}", "Sun, 14 Apr 2024 09:01:01 PT", 0, 100)
+
+    # then:
+    assert len(store) == 3
@@ -0,0 +1,155 @@
+import json
+
+import pytest
+import requests
+
+from rsync_net_exporter import tracing
+
+
+TARGET = "https://rsync.example.net/blah.xml"
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(TRACING_ENABLED="true", TRACING_EXPORTER="memory")
+
+
+@pytest.fixture
+def spans(app):
+    return app.extensions["rsync_net_exporter.tracing"].spans
+
+
+@pytest.fixture
+def client(app, requests_mock, sample_xml):
+    requests_mock.get(TARGET, text=sample_xml)
+    return app.test_client()
+
+
+def test_probe_stages(client, spans):
+    # when:
+    client.get("/probe", query_string={"target": TARGET})
+
+    # then:
+    by_name = {span.name: span for span in spans}
+    assert set(by_name) == {
+        "probe",
+        "allowlist",
+        "render",
+        "fetch",
+        "parse",
+        "decode",
+    }
+    assert by_name["probe"].parent_id is None
+    for name in ["allowlist", "fetch", "parse", "render"]:
+        assert by_name[name].parent_id == by_name["probe"].span_id
+    assert by_name["decode"].parent_id == by_name["parse"].span_id
+    assert len({span.trace_id for span in spans}) == 1
+
+
+class BatchRecordingExporter:
+    def __init__(self):
+        self.batches = []
+
+    def export(self, spans):
+        self.batches.append(list(spans))
+
+
+def test_trace_exported_when_probe_ends(app, client, monkeypatch):
+    # given:
+    exporter = BatchRecordingExporter()
+    monkeypatch.setitem(app.extensions, "rsync_net_exporter.tracing", exporter)
+
+    # when:
+    client.get("/probe", query_string={"target": TARGET})
+
+    # then:
+    [batch] = exporter.batches
+    assert batch[-1].name == "probe"
+    assert {span.name for span in batch} >= {"fetch", "parse", "decode"}
+
+
+def test_incoming_trace_context(client, spans):
+    # given:
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    parent_id = "00f067aa0ba902b7"
+
+    # when:
+    client.get(
+        "/probe",
+        query_string={"target": TARGET},
+        headers={"traceparent": f"00-{trace_id}-{parent_id}-01"},
+    )
+
+    # then:
+    probe = next(span for span in spans if span.name == "probe")
+    assert probe.trace_id == trace_id
+    assert probe.parent_id == parent_id
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        "garbage",
+        "00-00000000000000000000000000000000-00f067aa0ba902b7-01",
+        "00-4bf92f3577b34da6a3ce929d0e0e4736-0000000000000000-01",
+    ],
+)
+def test_invalid_incoming_trace_context(client, spans, header):
+    # when:
+    client.get(
+        "/probe", query_string={"target": TARGET}, headers={"traceparent": header}
+    )
+
+    # then:
+    probe = next(span for span in spans if span.name == "probe")
+    assert probe.parent_id is None
+
+
+def test_error_recorded(client, spans, requests_mock):
+    # given:
+    requests_mock.get(TARGET, status_code=502)
+
+    # when:
+    with pytest.raises(requests.HTTPError):
+        client.get("/probe", query_string={"target": TARGET})
+
+    # then:
+    fetch = next(span for span in spans if span.name == "fetch")
+    assert fetch.status == "error" and "HTTPError" in fetch.error
+
+
+def test_span_outside_app_is_noop():
+    # when:
+    with tracing.span("nothing") as span:
+        pass
+
+    # then:
+    assert span is None
+
+
+def test_disabled_span_is_noop(make_app):
+    # given:
+    disabled = make_app()
+
+    # when:
+    with disabled.app_context(), tracing.span("nothing") as span:
+        pass
+
+    # then:
+    assert span is None
+
+
+def test_file_exporter(tmp_path):
+    # given:
+    path = tmp_path / "spans.jsonl"
+    exporter = tracing.FileSpanExporter(str(path))
+    span = tracing.Span("probe", "a" * 32, "b" * 16, None, 1, 2)
+
+    # when:
+    exporter.export([span, span])
+    exporter.close()
+
+    # then:
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["name"] == "probe"
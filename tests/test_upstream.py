@@ -0,0 +1,72 @@
+from flask import Flask
+import pytest
+import requests
+
+from rsync_net_exporter import dns_cache, tracing, upstream
+
+
+def test_adapter_connects_to_cached_address(httpserver, resolver):
+    # given:
+    httpserver.expect_request("/rss.xml").respond_with_data("hello")
+    resolver.answer = ["127.0.0.1"]
+    sess = requests.Session()
+    sess.mount(
+        "http://", upstream.UpstreamAdapter(dns_cache.DnsCache(5, 300, resolver))
+    )
+
+    # when:
+    r1 = sess.get(f"http://rsync.invalid:{httpserver.port}/rss.xml", timeout=2)
+    r2 = sess.get(f"http://rsync.invalid:{httpserver.port}/rss.xml", timeout=2)
+
+    # then:
+    assert r1.text == r2.text == "hello"
+    assert resolver.calls == 1
+    assert httpserver.log[0][0].headers["Host"] == f"rsync.invalid:{httpserver.port}"
+
+
+def test_adapter_traces_new_connections(httpserver):
+    # given:
+    exporter = tracing.InMemorySpanExporter()
+    app = Flask(__name__)
+    app.extensions["rsync_net_exporter.tracing"] = exporter
+    httpserver.expect_request("/rss.xml").respond_with_data("hello")
+    sess = requests.Session()
+    sess.mount("http://", upstream.UpstreamAdapter())
+
+    # when:
+    with app.app_context():
+        sess.get(httpserver.url_for("/rss.xml"), timeout=2)
+
+    # then:
+    assert [span.name for span in exporter.spans] == ["connect"]
+    assert exporter.spans[0].attributes["port"] == httpserver.port
+
+
+def test_fetch(requests_mock):
+    # given:
+    requests_mock.get("https://rsync.example.net/rss.xml", content=b"x" * 100)
+
+    # when:
+    body = upstream.Upstream(max_response_bytes=100).fetch(
+        "https://rsync.example.net/rss.xml"
+    )
+
+    # then:
+    assert body == b"x" * 100
+
+
+@pytest.mark.parametrize("content_length", [True, False])
+def test_fetch_too_large(requests_mock, content_length):
+    # given:
+    requests_mock.get(
+        "https://rsync.example.net/rss.xml",
+        content=b"x" * 101,
+        headers={} if content_length else {"Content-Length": ""},
+    )
+
+    # then:
+    with pytest.raises(upstream.ResponseTooLarge):
+        # when:
+        upstream.Upstream(max_response_bytes=100).fetch(
+            "https://rsync.example.net/rss.xml"
+        )